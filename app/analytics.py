@@ -0,0 +1,188 @@
+"""Vistas materializadas de analítica y su refresco en segundo plano.
+
+Las agregaciones pesadas (totales por jugador, win rate por juego, resumen
+por sesión) viven en vistas materializadas (migración 003). El cara a cara
+no: lo arma app/rivalries.py en memoria.
+Un hilo único por proceso las refresca con REFRESH ... CONCURRENTLY cada
+ANALYTICS_REFRESH_SECONDS, o antes si se registraron ANALYTICS_REFRESH_EVERY_N
+partidas nuevas, y de paso pone al día el rating Elo (app/ratings.py).
+Las páginas solo leen las vistas y muestran "datos al ...".
+
+    uv run python -m app.analytics refresh
+"""
+import argparse
+import logging
+import os
+import threading
+
+import streamlit as st
+from sqlalchemy import text
+
+from app import data, matches, ratings, telemetry
+from app.database import get_engine
+
+logger = logging.getLogger(__name__)
+
+VIEWS = ["mv_player_totals", "mv_game_win_rates", "mv_session_summary"]
+
+REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "300"))
+REFRESH_EVERY_N = int(os.getenv("ANALYTICS_REFRESH_EVERY_N", "10"))
+
+# Partidas que no ve la vista más atrasada (cada una guarda la foto de su refresco)
+SQL_PENDING = text(f"""
+    SELECT COALESCE(MAX(p.pending), 0)
+    FROM analytics_refresh r
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) AS pending FROM matches m
+        WHERE {matches.unseen("m.recorded_xid", snapshot_column="r.snapshot")}
+    ) p
+""")
+
+SQL_MARK_REFRESHED = text("""
+    INSERT INTO analytics_refresh (view_name, refreshed_at, snapshot)
+    VALUES (:v, NOW(), :s)
+    ON CONFLICT (view_name) DO UPDATE SET refreshed_at = NOW(), snapshot = EXCLUDED.snapshot
+""")
+
+SQL_AS_OF = "SELECT MIN(refreshed_at) AS as_of FROM analytics_refresh"
+
+SQL_PLAYER_TOTALS = """
+    SELECT
+        p.nickname AS "Caballero",
+        t.matches_played AS "Partidas",
+        t.wins AS "Victorias",
+        t.win_rate AS "Win Rate %",
+        t.sessions_played AS "Juntadas",
+        t.games_played AS "Juegos Distintos",
+        t.avg_duration AS "Duración Promedio"
+    FROM mv_player_totals t
+    JOIN players p ON p.player_id = t.player_id
+    WHERE p.group_id = :group_id
+    ORDER BY t.wins DESC
+"""
+
+SQL_GAME_WIN_RATES = """
+    SELECT g.name AS juego, p.nickname AS caballero, w.matches_played, w.wins, w.win_rate
+    FROM mv_game_win_rates w
+    JOIN games g ON g.game_id = w.game_id
+    JOIN players p ON p.player_id = w.player_id
+    WHERE p.group_id = :group_id
+"""
+
+SQL_SESSION_SUMMARY = """
+    SELECT
+        s.date AS "Fecha",
+        h.nickname AS "Anfitrión",
+        s.matches_played AS "Partidas",
+        s.players AS "Jugadores",
+        s.total_minutes AS "Minutos",
+        w.nickname AS "Figura de la Noche"
+    FROM mv_session_summary s
+    JOIN sessions ss ON ss.session_id = s.session_id
+    LEFT JOIN players h ON h.player_id = s.host_id
+    LEFT JOIN players w ON w.player_id = s.top_winner_id
+    WHERE ss.group_id = :group_id
+    ORDER BY s.date DESC
+    LIMIT 20
+"""
+
+
+def refresh(engine=None):
+    """Refresca todas las vistas sin bloquear lecturas y registra qué partidas ven."""
+    engine = engine or get_engine()
+    for view in VIEWS:
+        with engine.begin() as conn:
+            # La foto antes del REFRESH: lo que se confirme en el medio queda
+            # pendiente para la próxima vuelta, nunca marcado como visto
+            snapshot = conn.execute(text(matches.SQL_SNAPSHOT)).scalar_one()
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"))
+            conn.execute(SQL_MARK_REFRESHED, {"v": view, "s": snapshot})
+    data.invalidate("analytics")
+
+
+def pending_matches(engine=None):
+    """Cantidad de partidas que todavía no entraron en alguna vista."""
+    with (engine or get_engine()).connect() as conn:
+        return conn.execute(SQL_PENDING).scalar_one()
+
+
+class RefreshScheduler(threading.Thread):
+    """Hilo que refresca las vistas por tiempo o cuando se acumulan N partidas."""
+
+    def __init__(self, engine):
+        super().__init__(name="analytics-refresh", daemon=True)
+        self.engine = engine
+        self.recorded = 0
+        self._wake = threading.Event()
+        # La primera vuelta apenas arranca: pone al día lo que haya quedado pendiente
+        self._wake.set()
+        self._lock = threading.Lock()
+
+    def match_recorded(self):
+        with self._lock:
+            self.recorded += 1
+            if self.recorded >= REFRESH_EVERY_N:
+                self._wake.set()
+
+    def run(self):
+        telemetry.set_origin("analytics:refresh")
+        while True:
+            self._wake.wait(REFRESH_SECONDS)
+            self._wake.clear()
+            with self._lock:
+                self.recorded = 0
+            try:
+                if pending_matches(self.engine):
+                    refresh(self.engine)
+                # El rating tiene su propio checkpoint: en una base existente
+                # arranca de cero aunque las vistas ya estén al día
+                if ratings.update(self.engine):
+                    data.invalidate("analytics")
+            except Exception:
+                logger.exception("Error refrescando las vistas de analítica")
+
+
+@st.cache_resource
+def get_scheduler():
+    """Arranca (una sola vez por proceso) el hilo de refresco."""
+    scheduler = RefreshScheduler(get_engine())
+    scheduler.start()
+    return scheduler
+
+
+def match_recorded():
+    """Avisa al scheduler que hay una partida nueva (no toca la base)."""
+    get_scheduler().match_recorded()
+
+
+# --- LECTURAS (cacheadas hasta el próximo refresco, por cofradía) ---
+
+def as_of():
+    df = data.cached_read(SQL_AS_OF, tags=["analytics"], replica=True)
+    return df["as_of"].iloc[0] if not df.empty else None
+
+
+def player_totals(group_id):
+    return data.cached_read(SQL_PLAYER_TOTALS, tags=["analytics", "players"], params={"group_id": group_id}, replica=True)
+
+
+def game_win_rates(group_id):
+    return data.cached_read(
+        SQL_GAME_WIN_RATES, tags=["analytics", "players", "games"], params={"group_id": group_id}, replica=True
+    )
+
+
+def session_summary(group_id):
+    return data.cached_read(SQL_SESSION_SUMMARY, tags=["analytics", "players"], params={"group_id": group_id}, replica=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vistas materializadas de analítica")
+    parser.add_argument("command", choices=["refresh"])
+    parser.parse_args(argv)
+    refresh()
+    print(f"Vistas refrescadas: {', '.join(VIEWS)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Motor de premios de "La Meta de los 5" (reglas en app/pages/rules.py).
+
+Cada jugador lleva un contador de victorias desde su último premio. La racha
+arranca con la primera victoria contada; desde ahí se anota quién participó
+en alguna partida (award_streak_players). Al llegar a la quinta victoria se
+emite un award_event, se suma +1 PV y cada jugador que participó durante la
+racha debe el Tributo (2 USD). Quien no jugó nunca en ese período queda
+exento, simplemente porque no aparece en la lista.
+
+Se actualiza dentro de la transacción que registra la partida, sin releer
+el historial. Para reconstruir todo desde cero (por ejemplo, tras importar
+noches viejas):
+
+    uv run python -m app.awards replay
+"""
+import argparse
+
+from sqlalchemy import text
+
+AWARD_WINS = 5
+TRIBUTE_USD = 2
+
+# Suma la victoria al ganador y anota a los participantes en cada racha abierta
+SQL_APPLY_MATCH = text("""
+    WITH win AS (
+        INSERT INTO award_counters AS c (player_id, wins_since_award, streak_start_match_id)
+        SELECT winner_id, 1, match_id FROM matches
+        WHERE match_id = :m AND winner_id IS NOT NULL
+        ON CONFLICT (player_id) DO UPDATE SET
+            wins_since_award = c.wins_since_award + 1,
+            streak_start_match_id = COALESCE(c.streak_start_match_id, EXCLUDED.streak_start_match_id)
+        RETURNING player_id, wins_since_award
+    ),
+    open_streaks AS (
+        -- Solo las rachas de la cofradía de la partida
+        SELECT c.player_id
+        FROM award_counters c
+        JOIN players p ON p.player_id = c.player_id
+        WHERE c.wins_since_award > 0 AND p.group_id = (SELECT group_id FROM matches WHERE match_id = :m)
+        UNION
+        SELECT player_id FROM win
+    ),
+    seen AS (
+        INSERT INTO award_streak_players (player_id, participant_id)
+        SELECT o.player_id, mp.player_id
+        FROM open_streaks o
+        JOIN match_participants mp ON mp.match_id = :m AND mp.player_id <> o.player_id
+        ON CONFLICT DO NOTHING
+    )
+    SELECT player_id, wins_since_award FROM win
+""")
+
+SQL_AWARD = text("""
+    INSERT INTO award_events (player_id, match_id, streak_start_match_id)
+    SELECT player_id, :m, streak_start_match_id FROM award_counters WHERE player_id = :w
+    RETURNING award_id
+""")
+
+SQL_TRIBUTES = text("""
+    INSERT INTO award_tributes (award_id, player_id, amount_usd)
+    SELECT :a, participant_id, :amount FROM award_streak_players WHERE player_id = :w
+    RETURNING player_id
+""")
+
+SQL_CLOSE_STREAK = text("""
+    UPDATE award_counters
+    SET wins_since_award = 0, streak_start_match_id = NULL, pv = pv + 1
+    WHERE player_id = :w
+""")
+
+SQL_STANDINGS = """
+    SELECT
+        p.nickname AS "Caballero",
+        COALESCE(c.wins_since_award, 0) AS "Victorias en Racha",
+        COALESCE(c.pv, 0) AS "PV",
+        COALESCE(t.owed, 0) AS "Tributo Pendiente (USD)"
+    FROM players p
+    LEFT JOIN award_counters c ON c.player_id = p.player_id
+    LEFT JOIN (
+        SELECT player_id, SUM(amount_usd) AS owed
+        FROM award_tributes WHERE NOT paid
+        GROUP BY player_id
+    ) t ON t.player_id = p.player_id
+    WHERE p.group_id = :group_id AND (c.player_id IS NOT NULL OR t.owed IS NOT NULL)
+    ORDER BY "PV" DESC, "Victorias en Racha" DESC
+"""
+
+
+def apply_match(conn, match_id):
+    """Procesa una partida ya insertada. Devuelve el premio emitido o None.
+
+    El premio es un dict con award_id, player_id y la lista de deudores.
+    """
+    row = conn.execute(SQL_APPLY_MATCH, {"m": match_id}).one_or_none()
+    if row is None or row.wins_since_award < AWARD_WINS:
+        return None
+
+    award_id = conn.execute(SQL_AWARD, {"m": match_id, "w": row.player_id}).scalar_one()
+    debtors = conn.execute(
+        SQL_TRIBUTES, {"a": award_id, "w": row.player_id, "amount": TRIBUTE_USD}
+    ).scalars().all()
+    conn.execute(text("DELETE FROM award_streak_players WHERE player_id = :w"), {"w": row.player_id})
+    conn.execute(SQL_CLOSE_STREAK, {"w": row.player_id})
+    return {"award_id": award_id, "player_id": row.player_id, "debtors": debtors}
+
+
+def replay(conn):
+    """Borra el estado de premios y reprocesa todas las partidas en orden cronológico."""
+    conn.execute(text(
+        "TRUNCATE award_tributes, award_events, award_streak_players, award_counters RESTART IDENTITY"
+    ))
+    match_ids = conn.execute(text("""
+        SELECT m.match_id FROM matches m
+        LEFT JOIN sessions s ON s.session_id = m.session_id
+        ORDER BY s.date NULLS FIRST, m.match_id
+    """)).scalars().all()
+    return sum(1 for match_id in match_ids if apply_match(conn, match_id))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Premios de La Meta de los 5")
+    parser.add_argument("command", choices=["replay"])
+    parser.parse_args(argv)
+
+    from app.database import get_engine
+
+    with get_engine().begin() as conn:
+        total = replay(conn)
+    print(f"Premios reconstruidos: {total} premios otorgados.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Capa de acceso a datos compartida con cache por tablas.
+
+Las listas casi estáticas (jugadores, juegos, anfitriones, últimas sesiones)
+se guardan en un cache de proceso con TTL y tamaño acotado. Cada entrada
+lleva las tablas de las que depende; cuando una escritura toca una tabla,
+llama a invalidate() con ese tag y solo se borran las entradas afectadas.
+Un rerun que no escribe nada no hace ningún viaje a la base por estos datos.
+
+Las lecturas de una cofradía (con group_id en los parámetros) llevan además
+los tags "<tabla>@<group_id>": invalidate(..., group_id=g) borra solo lo de
+esa cofradía, y sin group_id se borra lo de todas.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import NamedTuple
+
+import pandas as pd
+from sqlalchemy import text
+
+from app.database import get_engine, read_connection
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "128"))
+# cached_items guarda una entrada por ítem (por ejemplo, una por juego): va
+# en un cache aparte para no desalojar las listas ni desalojarse entre sí
+ITEM_CACHE_MAX_ENTRIES = int(os.getenv("ITEM_CACHE_MAX_ENTRIES", "2048"))
+
+
+class TaggedCache:
+    """Cache LRU con vencimiento por tiempo e invalidación por tag."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (vence, tags, valor)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, _, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, tags, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, frozenset(tags), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tags):
+        with self._lock:
+            stale = [k for k, (_, entry_tags, _) in self._entries.items() if entry_tags.intersection(tags)]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = TaggedCache(CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES)
+_item_cache = TaggedCache(CACHE_TTL_SECONDS, ITEM_CACHE_MAX_ENTRIES)
+
+
+def cached_read(sql, tags, params=None, replica=False):
+    """Ejecuta `sql` (o devuelve lo cacheado) y lo etiqueta con `tags`.
+
+    Con `replica=True` la lectura va a la réplica si hay una configurada.
+    Devuelve una copia para que quien llama pueda agregar columnas sin
+    ensuciar el cache.
+    """
+    key = (sql, tuple(sorted((params or {}).items())))
+    df = _cache.get(key)
+    if df is None:
+        connect = read_connection if replica else get_engine().connect
+        with connect() as conn:
+            df = pd.read_sql_query(text(sql), conn, params=params)
+        _cache.put(key, _group_tags(tags, (params or {}).get("group_id")), df)
+    return df.copy()
+
+
+def _group_tags(tags, group_id):
+    if group_id is None:
+        return list(tags)
+    return [*tags, *(f"{tag}@{group_id}" for tag in tags)]
+
+
+def cached_items(keys, tags_of, load):
+    """Cache por ítem para resultados que se calculan juntos pero se invalidan de a uno.
+
+    Devuelve {clave: valor}. Las claves que no están cacheadas se piden todas
+    juntas con `load(faltantes)`, que devuelve {clave: valor}; cada una queda
+    con los tags de `tags_of(clave)`. Los valores se comparten: no modificarlos.
+    """
+    found, missing = {}, []
+    for key in keys:
+        value = _item_cache.get(key)
+        if value is None:
+            missing.append(key)
+        else:
+            found[key] = value
+    if missing:
+        for key, value in load(missing).items():
+            _item_cache.put(key, tags_of(key), value)
+            found[key] = value
+    return found
+
+
+def invalidate(*tags, group_id=None):
+    """Borra las entradas que dependen de alguna de las tablas indicadas.
+
+    Con `group_id` solo las de esa cofradía.
+    """
+    if group_id is not None:
+        tags = [f"{tag}@{group_id}" for tag in tags]
+    _cache.invalidate(*tags)
+    _item_cache.invalidate(*tags)
+
+
+# --- LOOKUPS COMPARTIDOS ---
+
+SQL_HOSTS = """
+    SELECT nickname, player_id
+    FROM players
+    WHERE group_id = :group_id AND (active = TRUE OR role = 'Sede')
+    ORDER BY nickname ASC
+"""
+
+SQL_ALL_PLAYERS = "SELECT player_id, nickname FROM players WHERE group_id = :group_id ORDER BY nickname"
+
+SQL_GAMES = "SELECT game_id, name FROM games WHERE group_id = :group_id ORDER BY name"
+
+# Todo lo que necesitan los formularios, en un solo viaje: cada lista viene
+# como un arreglo JSON dentro de una única fila.
+SQL_FORM_LOOKUP = """
+    SELECT
+        (SELECT COALESCE(json_agg(json_build_object('session_id', s.session_id, 'date', s.date, 'host', p.nickname)
+                                  ORDER BY s.date DESC), '[]')
+         FROM (SELECT session_id, date, host_id FROM sessions
+               WHERE group_id = :group_id ORDER BY date DESC LIMIT :limit) s
+         JOIN players p ON s.host_id = p.player_id) AS sessions,
+        (SELECT COALESCE(json_agg(json_build_object('player_id', player_id, 'nickname', nickname)
+                                  ORDER BY player_id), '[]')
+         FROM players WHERE group_id = :group_id AND active = TRUE) AS players,
+        (SELECT COALESCE(json_agg(json_build_object('game_id', game_id, 'name', name,
+                                                    'playable', name <> 'Jugar con tu señora')
+                                  ORDER BY name), '[]')
+         FROM games WHERE group_id = :group_id) AS games
+"""
+
+SQL_PLAYERS_VIEW = """
+    SELECT p.nickname AS nombre, p.role, g.name AS favorite_game, p.owned_games, p.birth_date
+    FROM players p
+    LEFT JOIN games g ON p.favgame_id = g.game_id
+    WHERE p.group_id = :group_id AND p.active = TRUE
+    ORDER BY p.created_at DESC
+"""
+
+SQL_GAMES_VIEW = """
+    SELECT g.logo, g.name, g.type, g.min_players, g.max_players, p.nickname AS owner
+    FROM games g
+    LEFT JOIN players p ON g.owner_id = p.player_id
+    WHERE g.group_id = :group_id
+    ORDER BY g.name ASC
+"""
+
+
+def hosts(group_id):
+    """Jugadores activos y sedes de la cofradía, para elegir anfitrión."""
+    return cached_read(SQL_HOSTS, tags=["players"], params={"group_id": group_id})
+
+
+def all_players(group_id):
+    return cached_read(SQL_ALL_PLAYERS, tags=["players"], params={"group_id": group_id})
+
+
+def games(group_id):
+    """Catálogo de juegos de la cofradía."""
+    return cached_read(SQL_GAMES, tags=["games"], params={"group_id": group_id})
+
+
+class FormLookup(NamedTuple):
+    """Listas de los formularios (inmutable: se comparte entre reruns y sesiones).
+
+    Las opciones son tuplas en el orden en que se muestran y los *_ids
+    traducen de la etiqueta elegida al id.
+    """
+    session_labels: tuple
+    session_ids: MappingProxyType
+    player_names: tuple
+    player_ids: MappingProxyType
+    game_names: tuple
+    playable_games: tuple
+    game_ids: MappingProxyType
+
+
+def _build_lookup(sessions, players, games):
+    # Etiquetas de las juntadas con operaciones de columna, sin recorrer fila por fila
+    sessions = pd.DataFrame(sessions, columns=["session_id", "date", "host"])
+    # astype(str): sin juntadas (una cofradía nueva) la columna queda object y
+    # pandas 3 no la suma con las fechas, que salen como str
+    labels = pd.to_datetime(sessions["date"]).dt.strftime("%d/%m/%Y") + "  -📍 " + sessions["host"].astype(str)
+    players = pd.DataFrame(players, columns=["player_id", "nickname"])
+    games = pd.DataFrame(games, columns=["game_id", "name", "playable"])
+    return FormLookup(
+        session_labels=tuple(labels),
+        session_ids=MappingProxyType(dict(zip(labels, sessions["session_id"].tolist()))),
+        player_names=tuple(players["nickname"]),
+        player_ids=MappingProxyType(dict(zip(players["nickname"], players["player_id"].tolist()))),
+        game_names=tuple(games["name"]),
+        playable_games=tuple(games.loc[games["playable"].astype(bool), "name"]),
+        game_ids=MappingProxyType(dict(zip(games["name"], games["game_id"].tolist()))),
+    )
+
+
+def form_lookup(group_id, session_limit=10):
+    """Sesiones recientes, jugadores activos y juegos de la cofradía, en una sola consulta.
+
+    Comparte el cache (y la invalidación por tags) con el resto de las listas.
+    """
+    key = ("form_lookup", group_id, session_limit)
+    lookup = _cache.get(key)
+    if lookup is None:
+        with get_engine().connect() as conn:
+            row = conn.execute(text(SQL_FORM_LOOKUP), {"group_id": group_id, "limit": session_limit}).one()
+        lookup = _build_lookup(*(json.loads(v) if isinstance(v, str) else v for v in row))
+        _cache.put(key, _group_tags(["sessions", "players", "games"], group_id), lookup)
+    return lookup
+
+
+def players_view(group_id):
+    """Listado de jugadores activos para el panel de administración."""
+    return cached_read(SQL_PLAYERS_VIEW, tags=["players", "games"], params={"group_id": group_id}, replica=True)
+
+
+def games_view(group_id):
+    """Listado de la ludoteca para el panel de administración."""
+    return cached_read(SQL_GAMES_VIEW, tags=["games", "players"], params={"group_id": group_id}, replica=True)
@@ -1,23 +1,112 @@
 import os
+import time
+from contextlib import contextmanager
+
 import streamlit as st
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
 from dotenv import load_dotenv
 
+from app import telemetry
+
 # Carga variables del archivo .env si existe
 load_dotenv()
 
-def get_db_url():
+# Drivers soportados: pg8000 (Python puro) o psycopg2 (C, decodifica filas más rápido)
+DRIVERS = {"pg8000", "psycopg2"}
+
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "si", "sí")
+
+# Si la réplica no responde, no la volvemos a intentar durante este tiempo
+REPLICA_RETRY_SECONDS = 30
+_replica_down_until = 0.0
+
+def get_db_url(driver=None, host=None, port=None, name=None):
     """Construye la URL de conexión leyendo el entorno."""
     user = os.getenv("DB_USER", "admin")
     password = os.getenv("DB_PASSWORD", "password123")
-    host = os.getenv("DB_HOST", "localhost") 
-    port = os.getenv("DB_PORT", "5432")      
-    name = os.getenv("DB_NAME", "leaderboard_db")
-    
-    return f"postgresql+pg8000://{user}:{password}@{host}:{port}/{name}"
+    host = host or os.getenv("DB_HOST", "localhost")
+    port = port or os.getenv("DB_PORT", "5432")
+    name = name or os.getenv("DB_NAME", "leaderboard_db")
+    driver = driver or os.getenv("DB_DRIVER", "pg8000")
+    if driver not in DRIVERS:
+        raise ValueError(f"DB_DRIVER inválido: {driver} (opciones: {', '.join(sorted(DRIVERS))})")
+
+    return f"postgresql+{driver}://{user}:{password}@{host}:{port}/{name}"
+
+def get_pool_options():
+    """Parámetros del pool de conexiones, configurables por entorno."""
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+def _install_statement_timeout(engine, timeout_ms):
+    """Aplica statement_timeout a cada conexión nueva (funciona con ambos drivers)."""
+    @event.listens_for(engine, "connect")
+    def set_timeout(dbapi_conn, _):
+        cursor = dbapi_conn.cursor()
+        cursor.execute(f"SET statement_timeout = {int(timeout_ms)}")
+        cursor.close()
+        # pg8000 abre una transacción implícita; la cerramos para no dejarla colgada
+        dbapi_conn.commit()
+
+def _build_engine(url):
+    engine = create_engine(url, **get_pool_options())
+
+    if _env_bool("QUERY_TELEMETRY", True):
+        telemetry.install(engine)
+
+    timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+    if timeout_ms > 0:
+        _install_statement_timeout(engine, timeout_ms)
+    return engine
 
 @st.cache_resource
 def get_engine():
     """Crea y cachea la conexión para no abrir una nueva con cada clic."""
-    url = get_db_url()
-    return create_engine(url)
\ No newline at end of file
+    return _build_engine(get_db_url())
+
+@st.cache_resource
+def get_read_engine():
+    """Engine de solo lectura contra la réplica, o None si no hay DB_REPLICA_HOST."""
+    host = os.getenv("DB_REPLICA_HOST")
+    if not host:
+        return None
+    return _build_engine(get_db_url(host=host, port=os.getenv("DB_REPLICA_PORT", "5432")))
+
+@contextmanager
+def read_connection():
+    """Conexión para lecturas analíticas (stats, historial, listados).
+
+    Usa la réplica si está configurada y responde; si no, cae al primario.
+    Las escrituras siempre van por get_engine().
+    """
+    global _replica_down_until
+    conn = None
+    replica = get_read_engine()
+    if replica is not None and time.monotonic() >= _replica_down_until:
+        try:
+            conn = replica.connect()
+        except exc.DBAPIError:
+            _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+    if conn is None:
+        conn = get_engine().connect()
+    with conn:
+        yield conn
+
+def pool_stats(engine=None):
+    """Estado actual del pool, para medir y comparar configuraciones."""
+    engine = engine or get_engine()
+    pool = engine.pool
+    return {
+        "driver": engine.dialect.driver,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "status": pool.status(),
+    }
@@ -0,0 +1,249 @@
+"""Snapshots en Parquet para analizar fuera de la base de producción.
+
+Escribe players, games, sessions, matches y match_participants como
+archivos Parquet en SNAPSHOT_DIR, una carpeta por tabla:
+
+    snapshots/
+        manifest.json                 foto de la última corrida y fecha de cada una
+        players/part-full.parquet     dimensiones: se reescriben enteras
+        matches/part-000001.parquet   una parte por corrida
+        ...
+
+Las tablas de hechos (sessions, matches, match_participants) son de solo
+agregado: una exportación incremental trae solo las filas que no se veían
+en la foto de la base guardada en el manifest (matches.unseen, por la
+transacción que las insertó; las participaciones por la de su partida) y
+las deja en un archivo nuevo. Así no se pierde una partida que se confirmó
+después de otra con match_id mayor. Las filas se leen con un cursor del servidor (stream_results)
+de a EXPORT_CHUNK_ROWS, así que la memoria no depende del tamaño de la
+tabla, y todas las tablas salen de la misma foto (REPEATABLE READ).
+
+Con OFFLINE_SNAPSHOT=<carpeta> la app arranca en modo offline de solo
+lectura: el Salón de la Fama se calcula desde el snapshot, sin Postgres.
+
+    uv run python -m app.export              # incremental
+    uv run python -m app.export --full       # desde cero
+"""
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+from app import matches
+
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", Path(__file__).resolve().parent.parent / "snapshots"))
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "50000"))
+OFFLINE_SNAPSHOT = os.getenv("OFFLINE_SNAPSHOT") or None
+
+# Tabla -> (FROM, transacción que insertó la fila, orden), None = dimensión,
+# se exporta entera. Las participaciones se insertan junto con su partida.
+TABLES = {
+    "groups": None,
+    "players": None,
+    "games": None,
+    "sessions": ("sessions", "sessions.recorded_xid", "sessions.session_id"),
+    "matches": ("matches", "matches.recorded_xid", "matches.match_id"),
+    "match_participants": (
+        "match_participants JOIN matches ON matches.match_id = match_participants.match_id",
+        "matches.recorded_xid",
+        "match_participants.match_id",
+    ),
+}
+# Solo sirve para las lecturas incrementales, no para analizar
+INTERNAL_COLUMNS = {"recorded_xid"}
+
+# Tipos de Postgres -> Arrow (lo que no está acá se exporta como texto)
+ARROW_TYPES = {
+    "smallint": pa.int16(),
+    "integer": pa.int32(),
+    "bigint": pa.int64(),
+    "numeric": pa.float64(),
+    "real": pa.float32(),
+    "double precision": pa.float64(),
+    "boolean": pa.bool_(),
+    "date": pa.date32(),
+    "timestamp without time zone": pa.timestamp("us"),
+    "timestamp with time zone": pa.timestamp("us", tz="UTC"),
+}
+
+SQL_COLUMNS = text("""
+    SELECT column_name, data_type
+    FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = :t
+    ORDER BY ordinal_position
+""")
+
+
+def read_manifest(directory=SNAPSHOT_DIR):
+    path = Path(directory) / "manifest.json"
+    if not path.exists():
+        return {"snapshot": None, "runs": []}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _schema(conn, table):
+    columns = conn.execute(SQL_COLUMNS, {"t": table}).all()
+    return pa.schema([
+        (name, ARROW_TYPES.get(data_type, pa.string()))
+        for name, data_type in columns
+        if name not in INTERNAL_COLUMNS
+    ])
+
+
+def _conform(df, schema):
+    """Ajusta lo que el driver devuelve como objeto (Decimal, etc.) al tipo de Arrow."""
+    for field in schema:
+        if pa.types.is_floating(field.type):
+            df[field.name] = df[field.name].astype("float64")
+        elif pa.types.is_string(field.type):
+            df[field.name] = df[field.name].map(lambda v: v if v is None or isinstance(v, str) else str(v))
+    return df
+
+
+def _export_table(conn, table, source, seen, part, directory):
+    """Escribe un archivo Parquet con las filas nuevas. Devuelve las filas escritas."""
+    schema = _schema(conn, table)
+    columns = ", ".join(f"{table}.{name}" for name in schema.names)
+    if source:
+        from_clause, xid, order = source
+        sql = f"SELECT {columns} FROM {from_clause} WHERE {matches.unseen(xid)} ORDER BY {order}"
+    else:
+        sql = f"SELECT {columns} FROM {table}"
+
+    target_dir = directory / table
+    target_dir.mkdir(parents=True, exist_ok=True)
+    tmp = target_dir / ".part.tmp"  # con punto: pyarrow no lo lee como parte
+    rows = 0
+    result = conn.execution_options(stream_results=True, max_row_buffer=EXPORT_CHUNK_ROWS).execute(
+        text(sql), {"seen": seen}
+    )
+    try:
+        with pq.ParquetWriter(tmp, schema) as writer:
+            for chunk in result.partitions(EXPORT_CHUNK_ROWS):
+                df = _conform(pd.DataFrame.from_records(chunk, columns=schema.names), schema)
+                writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+                rows += len(df)
+    except BaseException:
+        # Sin parte a medio escribir: el manifest no cambia y la próxima corrida repite esta
+        tmp.unlink(missing_ok=True)
+        raise
+
+    if source and rows == 0:
+        tmp.unlink()
+    else:
+        name = f"part-{part:06d}.parquet" if source else "part-full.parquet"
+        tmp.replace(target_dir / name)
+    return rows
+
+
+def export(engine, directory=SNAPSHOT_DIR, full=False, log=print):
+    """Exporta las tablas (incremental salvo `full`) y actualiza el manifest.
+
+    Devuelve {tabla: filas exportadas}.
+    """
+    directory = Path(directory)
+    if not full and "watermarks" in read_manifest(directory):
+        # Manifest de antes de la migración 012: sus marcas por id no sirven
+        log("  El snapshot es de una versión anterior: se exporta desde cero.")
+        full = True
+    if full:
+        # Solo lo que escribe este módulo, por si la carpeta tiene otras cosas
+        for table in TABLES:
+            shutil.rmtree(directory / table, ignore_errors=True)
+        (directory / "manifest.json").unlink(missing_ok=True)
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(directory)
+    seen = manifest["snapshot"] or matches.SNAPSHOT_EMPTY
+    part = len(manifest["runs"]) + 1
+
+    exported = {}
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="REPEATABLE READ")
+        with conn.begin():
+            # Primera sentencia: fija la foto que comparten todas las tablas
+            snapshot = conn.execute(text(matches.SQL_SNAPSHOT)).scalar_one()
+            for table, source in TABLES.items():
+                rows = _export_table(conn, table, source, seen, part, directory)
+                exported[table] = rows
+                log(f"  {table}: {rows} filas")
+
+    manifest["snapshot"] = snapshot
+    manifest["runs"].append({
+        "at": datetime.now().isoformat(timespec="seconds"),
+        "full": full,
+        "rows": exported,
+    })
+    (directory / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return exported
+
+
+# --- MODO OFFLINE ---
+
+def read_table(table, directory=None):
+    """Lee una tabla del snapshot (todas sus partes) como DataFrame."""
+    return pq.read_table(Path(directory or OFFLINE_SNAPSHOT) / table).to_pandas()
+
+
+def offline_groups(directory=None):
+    """Cofradías del snapshot (None si es de antes de la migración 008)."""
+    if not (Path(directory or OFFLINE_SNAPSHOT) / "groups").exists():
+        return None
+    return read_table("groups", directory)
+
+
+def offline_leaderboard(directory=None, date_from=None, date_to=None, group_id=None):
+    """Salón de la Fama calculado desde el snapshot, con las columnas de SQL_LEADERBOARD.
+
+    Con `date_from`/`date_to` se limita a las juntadas de ese rango [desde, hasta)
+    y con `group_id` a los jugadores de esa cofradía.
+    """
+    players = read_table("players", directory)
+    if group_id is not None:
+        players = players[players["group_id"] == group_id]
+    parts = read_table("match_participants", directory)[["match_id", "player_id", "rank"]]
+    dates = read_table("matches", directory)[["match_id", "session_id"]].merge(
+        read_table("sessions", directory)[["session_id", "date"]], on="session_id", how="left"
+    )
+    parts = parts.merge(dates[["match_id", "date"]], on="match_id", how="left")
+    if date_from is not None:
+        parts = parts[(parts["date"] >= date_from) & (parts["date"] < date_to)]
+    parts = parts.assign(win=parts["rank"] == 1, runner_up=parts["rank"] == 2)
+
+    board = parts.groupby("player_id").agg(
+        matches_played=("match_id", "size"),
+        wins=("win", "sum"),
+        runner_ups=("runner_up", "sum"),
+        last_played=("date", "max"),
+    ).reset_index()
+    board = board.merge(players[["player_id", "nickname"]], on="player_id")
+    board = board.rename(columns={
+        "nickname": "Caballero",
+        "matches_played": "Partidas Jugadas",
+        "wins": "Victorias",
+        "runner_ups": "Subcampeonatos",
+        "last_played": "Última Partida",
+    })
+    return board.sort_values(["Victorias", "Subcampeonatos"], ascending=False).reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshots Parquet para analistas")
+    parser.add_argument("--full", action="store_true", help="borra el snapshot y exporta todo")
+    parser.add_argument("--dir", default=str(SNAPSHOT_DIR))
+    args = parser.parse_args(argv)
+
+    from app.database import get_engine
+
+    exported = export(get_engine(), Path(args.dir), full=args.full)
+    print(f"Snapshot en {args.dir}: {sum(exported.values())} filas nuevas.")
+
+
+if __name__ == "__main__":
+    main()
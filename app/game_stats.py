@@ -0,0 +1,113 @@
+"""Analítica por juego: duración, tipo de victoria, tamaño de mesa y ganadores.
+
+Todo sale de una sola consulta con GROUPING SETS: una pasada sobre las
+partidas (con el tamaño de mesa contado desde match_participants) agrupa a
+la vez por juego, por juego y tamaño de mesa, y por juego y ganador. No hay
+una consulta por juego.
+
+El resultado se cachea por juego (tag "game:<id>"): al guardar una partida
+solo se invalida el juego de esa partida, y el próximo pedido recalcula
+únicamente los juegos vencidos, otra vez en una sola consulta.
+
+No hay orden de asiento en los datos, así que el efecto "primer jugador"
+no se puede medir; el efecto de la mesa se mide por cantidad de jugadores.
+"""
+import pandas as pd
+from sqlalchemy import text
+
+from app import data, history
+from app.database import get_engine
+
+SQL_GAME_REPORT = f"""
+    WITH sized AS (
+        SELECT m.match_id, m.game_id, m.winner_id, m.win_type, m.duration_minutes, COUNT(*) AS table_size
+        FROM matches m
+        JOIN match_participants mp ON mp.match_id = m.match_id
+        WHERE m.game_id = ANY(CAST(:games AS INTEGER[]))
+        GROUP BY m.match_id
+    )
+    SELECT
+        game_id,
+        table_size,
+        winner_id,
+        GROUPING(table_size, winner_id) AS level,
+        COUNT(*) AS matches,
+        ROUND(AVG(duration_minutes), 1) AS avg_duration,
+        percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_minutes) AS p50_duration,
+        percentile_cont(0.9) WITHIN GROUP (ORDER BY duration_minutes) AS p90_duration,
+        ROUND(100.0 * AVG(CASE WHEN win_type = '{history.WIN_CLUTCH}' THEN 1 ELSE 0 END), 1) AS clutch_pct,
+        ROUND(100.0 * AVG(CASE WHEN win_type = '{history.WIN_PALIZA}' THEN 1 ELSE 0 END), 1) AS paliza_pct,
+        ROUND(AVG(table_size), 1) AS avg_table_size
+    FROM sized
+    GROUP BY GROUPING SETS ((game_id), (game_id, table_size), (game_id, winner_id))
+"""
+
+# Valores de GROUPING(table_size, winner_id) para cada nivel de agregación
+LEVEL_GAME, LEVEL_TABLE_SIZE, LEVEL_WINNER = 3, 1, 2
+
+SUMMARY_COLUMNS = ["matches", "avg_duration", "p50_duration", "p90_duration", "clutch_pct", "paliza_pct", "avg_table_size"]
+
+
+def _load(keys):
+    """Calcula el reporte de los juegos pedidos en una sola consulta."""
+    game_ids = [game_id for _, game_id in keys]
+    # Del primario, como la tabla en vivo: se pide justo después de invalidar
+    # el juego de una partida nueva y una réplica atrasada dejaría cacheado
+    # el reporte de antes
+    with get_engine().connect() as conn:
+        df = pd.read_sql_query(text(SQL_GAME_REPORT), conn, params={"games": game_ids})
+    return _build_reports(df, game_ids)
+
+
+def _build_reports(df, game_ids):
+    """Arma el reporte de cada juego a partir del resultado de SQL_GAME_REPORT."""
+    reports = {}
+    for game_id in game_ids:
+        rows = df[df["game_id"] == game_id]
+        summary = rows[rows["level"] == LEVEL_GAME]
+        by_size = rows[rows["level"] == LEVEL_TABLE_SIZE]
+        winners = rows[rows["level"] == LEVEL_WINNER]
+
+        by_size = by_size[["table_size", "matches", "avg_duration", "clutch_pct", "paliza_pct"]].astype({"table_size": int})
+        # Con k jugadores, si nadie tuviera ventaja cada uno ganaría 1/k
+        by_size = by_size.assign(parejo_pct=(100.0 / by_size["table_size"]).round(1)).sort_values("table_size")
+
+        # Una partida sin ganador cuenta en el resumen pero no en el reparto
+        winners = winners.dropna(subset=["winner_id"])
+        winners = winners[["winner_id", "matches"]].rename(columns={"matches": "wins"}).astype({"winner_id": int})
+        winners = winners.assign(share_pct=(100.0 * winners["wins"] / winners["wins"].sum()).round(1))
+
+        reports[("game_stats", game_id)] = {
+            "summary": summary[SUMMARY_COLUMNS].iloc[0].to_dict() if not summary.empty else None,
+            "by_size": by_size.reset_index(drop=True),
+            "winners": winners.sort_values("wins", ascending=False).reset_index(drop=True),
+        }
+    return reports
+
+
+def game_report(game_ids):
+    """{game_id: {"summary", "by_size", "winners"}}; calcula juntos los que no estén cacheados."""
+    found = data.cached_items(
+        [("game_stats", int(game_id)) for game_id in game_ids],
+        tags_of=lambda key: [f"game:{key[1]}", "game_stats"],
+        load=_load,
+    )
+    return {game_id: report for (_, game_id), report in found.items()}
+
+
+def overview(game_ids):
+    """Una fila por juego con partidas, duración, tipo de victoria y reparto de victorias."""
+    rows = []
+    for game_id, report in game_report(game_ids).items():
+        if report["summary"] is None:
+            continue
+        winners = report["winners"]
+        rows.append({
+            "game_id": game_id,
+            **report["summary"],
+            "distinct_winners": len(winners),
+            "top_winner_id": winners["winner_id"].iloc[0] if not winners.empty else None,
+            "top_winner_pct": winners["share_pct"].iloc[0] if not winners.empty else None,
+        })
+    df = pd.DataFrame(rows, columns=["game_id", *SUMMARY_COLUMNS, "distinct_winners", "top_winner_id", "top_winner_pct"])
+    return df.astype({"matches": int})
@@ -0,0 +1,98 @@
+"""Cofradías: varios grupos de juego en una misma instalación.
+
+Jugadores, juegos, juntadas y partidas pertenecen a una cofradía
+(group_id, migración 008). Todas las consultas de la app filtran por la
+cofradía activa y los índices empiezan por group_id, así que el Salón de
+la Fama de un grupo chico no recorre las filas de uno grande. Los caches
+quedan separados solos: group_id viaja en los parámetros y
+data.cached_read agrega tags por cofradía (ver data.invalidate).
+
+La cofradía activa sale de la URL (?cofradia=<slug>), así cada grupo tiene
+su propio link. El selector de la barra lateral, que lista todas, solo
+aparece con la sesión de administrador iniciada. El link no es una
+credencial: quien conoce (o adivina) el slug de otra cofradía la ve y
+puede cargarle partidas, igual que cualquiera con la URL de la app.
+"""
+import os
+import re
+import unicodedata
+
+import streamlit as st
+from sqlalchemy import text
+
+from app import data
+
+DEFAULT_GROUP = os.getenv("DEFAULT_GROUP", "caballeros")
+
+SQL_GROUPS = "SELECT group_id, name, slug FROM groups ORDER BY group_id"
+
+# Tamaño de cada cofradía para el panel de administración
+SQL_GROUP_SUMMARY = """
+    SELECT
+        g.group_id,
+        g.name AS "Cofradía",
+        g.slug AS "Link",
+        (SELECT COUNT(*) FROM players p WHERE p.group_id = g.group_id AND p.active) AS "Caballeros",
+        (SELECT COUNT(*) FROM games j WHERE j.group_id = g.group_id) AS "Juegos",
+        (SELECT COUNT(*) FROM sessions s WHERE s.group_id = g.group_id) AS "Juntadas",
+        (SELECT COUNT(*) FROM matches m WHERE m.group_id = g.group_id) AS "Partidas",
+        g.created_at AS "Creada"
+    FROM groups g
+    ORDER BY g.group_id
+"""
+
+SQL_CREATE_GROUP = text("INSERT INTO groups (name, slug) VALUES (:n, :s) RETURNING group_id")
+
+SQL_RENAME_GROUP = text("UPDATE groups SET name = :n WHERE group_id = :g")
+
+
+def slugify(name):
+    """'Los Dados Locos' -> 'los-dados-locos' (para el link de la cofradía)."""
+    plain = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", plain.lower()).strip("-")
+
+
+def all_groups():
+    return data.cached_read(SQL_GROUPS, tags=["groups"])
+
+
+def group_id_for(conn, slug):
+    """group_id de un slug (para la consola); ValueError si no existe."""
+    group_id = conn.execute(text("SELECT group_id FROM groups WHERE slug = :s"), {"s": slug}).scalar()
+    if group_id is None:
+        raise ValueError(f"Cofradía desconocida: {slug}")
+    return group_id
+
+
+def current_group(df_groups=None):
+    """Cofradía activa según la URL o, para el administrador, el selector lateral. Devuelve (group_id, nombre).
+
+    `df_groups` permite pasar la lista desde otro origen (el snapshot del
+    modo offline); por defecto se lee de la base.
+    """
+    df_groups = all_groups() if df_groups is None else df_groups
+    slugs = df_groups["slug"].tolist()
+    names = dict(zip(df_groups["slug"], df_groups["name"]))
+    slug = st.query_params.get("cofradia", DEFAULT_GROUP)
+    if slug not in names:
+        slug = DEFAULT_GROUP if DEFAULT_GROUP in names else slugs[0]
+
+    # A un visitante no se le muestran las demás cofradías
+    if len(slugs) > 1 and st.session_state.get("admin_access_granted"):
+        slug = st.sidebar.selectbox("🏰 Cofradía", slugs, index=slugs.index(slug), format_func=names.get)
+        st.query_params["cofradia"] = slug
+
+    row = df_groups[df_groups["slug"] == slug].iloc[0]
+    return int(row["group_id"]), row["name"]
+
+
+def create_group(conn, name, slug=None):
+    """Crea una cofradía y devuelve su group_id."""
+    group_id = conn.execute(SQL_CREATE_GROUP, {"n": name, "s": slug or slugify(name)}).scalar_one()
+    data.invalidate("groups")
+    return group_id
+
+
+def rename_group(conn, group_id, name):
+    conn.execute(SQL_RENAME_GROUP, {"n": name, "g": group_id})
+    data.invalidate("groups")
@@ -0,0 +1,80 @@
+"""Historial de partidas paginado por keyset sobre matches.match_id.
+
+Nunca usamos OFFSET: cada página pide las partidas con match_id menor al
+último que se mostró, así el costo de una página no depende de cuántas
+partidas haya en la tabla. Los filtros se resuelven en SQL y siempre dentro
+de una cofradía (índice (group_id, match_id)).
+"""
+import pandas as pd
+from sqlalchemy import text
+
+PAGE_SIZE = 50
+
+# Tipos de victoria tal como se guardan en matches.win_type
+WIN_NORMAL = "Normal"
+WIN_CLUTCH = "Clutch (Sufrida)"
+WIN_PALIZA = "Paliza"
+WIN_TYPES = [WIN_NORMAL, WIN_CLUTCH, WIN_PALIZA]
+
+SQL_PAGE = """
+    SELECT
+        m.match_id,
+        s.date AS "Fecha",
+        m.duration_minutes AS "Duración",
+        g.name AS "Juego",
+        p.nickname AS "Ganador",
+        m.win_type AS "Tipo de Victoria"
+    FROM matches m
+    JOIN games g ON m.game_id = g.game_id
+    JOIN players p ON m.winner_id = p.player_id
+    JOIN sessions s ON m.session_id = s.session_id
+    {where}
+    ORDER BY m.match_id DESC
+    LIMIT :limit
+"""
+
+
+def build_filters(date_from=None, date_to=None, game_id=None, winner_id=None, win_type=None):
+    """Arma las condiciones WHERE y sus parámetros (solo las que vienen cargadas)."""
+    clauses, params = [], {}
+    if date_from is not None:
+        clauses.append("s.date >= :date_from")
+        params["date_from"] = date_from
+    if date_to is not None:
+        clauses.append("s.date <= :date_to")
+        params["date_to"] = date_to
+    if game_id is not None:
+        clauses.append("m.game_id = :game_id")
+        params["game_id"] = game_id
+    if winner_id is not None:
+        clauses.append("m.winner_id = :winner_id")
+        params["winner_id"] = winner_id
+    if win_type is not None:
+        clauses.append("m.win_type = :win_type")
+        params["win_type"] = win_type
+    return clauses, params
+
+
+def fetch_page(conn, group_id, before=None, page_size=PAGE_SIZE, **filters):
+    """Trae una página de partidas de la cofradía anteriores a `before` (match_id).
+
+    Devuelve (df, next_cursor). next_cursor es el match_id a usar como
+    `before` para la página siguiente, o None si no hay más partidas.
+    """
+    clauses, params = build_filters(**filters)
+    clauses.insert(0, "m.group_id = :group_id")
+    params["group_id"] = group_id
+    if before is not None:
+        clauses.append("m.match_id < :before")
+        params["before"] = before
+
+    where = f"WHERE {' AND '.join(clauses)}"
+    # Pedimos una fila de más para saber si existe una página siguiente
+    params["limit"] = page_size + 1
+    df = pd.read_sql_query(text(SQL_PAGE.format(where=where)), conn, params=params)
+
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        next_cursor = int(df["match_id"].iloc[-1])
+    return df, next_cursor
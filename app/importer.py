@@ -0,0 +1,326 @@
+"""Importación masiva de partidas históricas (CSV o JSONL).
+
+Cada fila del archivo es una partida:
+
+    date, host, game, winner, participants, win_type, duration_minutes
+    [, food, cost_per_person, total_attendees]
+
+`participants` va separado por ";" en CSV y como lista en JSONL. Las
+sesiones se resuelven por fecha (una juntada por día, igual que en la app)
+y se crean si no existen; los anfitriones desconocidos se dan de alta como
+'Sede', como hace el formulario de Nueva Sesión. Todo se carga en una
+cofradía: jugadores y juegos se buscan solo entre los suyos.
+
+El archivo se lee en streaming y se carga por bloques: cada bloque es una
+transacción con un puñado de sentencias (ids prealocados + unnest), sin
+importar cuántas filas tenga. Las filas inválidas no frenan la carga: se
+reportan con su número de línea y el motivo.
+
+    uv run python -m app.importer partidas.csv --rejects rechazos.csv
+    uv run python -m app.importer partidas.csv --cofradia los-dados-locos
+"""
+import argparse
+import csv
+import io
+import json
+from datetime import date
+from itertools import islice
+
+from sqlalchemy import text
+
+from app import history, stats
+
+CHUNK_SIZE = 1000
+
+SQL_RESERVE_MATCH_IDS = text("""
+    SELECT nextval(pg_get_serial_sequence('matches', 'match_id'))
+    FROM generate_series(1, :n)
+""")
+
+SQL_INSERT_SESSIONS = text("""
+    INSERT INTO sessions (date, host_id, food, cost_per_person, total_attendees, group_id)
+    SELECT t.*, CAST(:grp AS INTEGER) FROM unnest(
+        CAST(:dates AS DATE[]), CAST(:hosts AS INTEGER[]), CAST(:foods AS TEXT[]),
+        CAST(:costs AS INTEGER[]), CAST(:attendees AS INTEGER[])
+    ) AS t
+    RETURNING session_id, date
+""")
+
+SQL_INSERT_HOST = text("""
+    INSERT INTO players (name, nickname, role, active, created_at, owned_games, group_id)
+    VALUES (:n, :n, 'Sede', FALSE, NOW(), 0, :grp)
+    RETURNING player_id
+""")
+
+SQL_INSERT_MATCHES = text("""
+    INSERT INTO matches (match_id, session_id, game_id, winner_id, win_type, duration_minutes, group_id)
+    SELECT t.*, CAST(:grp AS INTEGER) FROM unnest(
+        CAST(:ids AS INTEGER[]), CAST(:sessions AS INTEGER[]), CAST(:games AS INTEGER[]),
+        CAST(:winners AS INTEGER[]), CAST(:win_types AS TEXT[]), CAST(:durations AS INTEGER[])
+    ) AS t
+""")
+
+SQL_INSERT_PARTICIPANTS = text("""
+    INSERT INTO match_participants (match_id, player_id, rank)
+    SELECT * FROM unnest(CAST(:matches AS INTEGER[]), CAST(:players AS INTEGER[]), CAST(:ranks AS INTEGER[]))
+""")
+
+
+class RowError(ValueError):
+    """Fila inválida: se rechaza y se sigue con la próxima."""
+
+
+def _key(name):
+    return str(name).strip().casefold()
+
+
+def _optional_int(value):
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f"número inválido: {value!r}")
+
+
+def read_rows(stream, fmt):
+    """Genera (número de línea, dict) leyendo el archivo de a una línea."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            row["participants"] = [p for p in (row.get("participants") or "").split(";") if p.strip()]
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, {"_error": f"JSON inválido: {e.msg}"}
+                    continue
+                if not isinstance(row, dict):
+                    row = {"_error": "la línea no es un objeto JSON"}
+                yield line_no, row
+    else:
+        raise ValueError(f"Formato no soportado: {fmt}")
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+class Importer:
+    """Mantiene en memoria los mapas nombre -> id y carga bloques de partidas."""
+
+    def __init__(self, engine, group_id=1):
+        self.engine = engine
+        self.group_id = group_id
+        params = {"grp": group_id}
+        with engine.connect() as conn:
+            self.players = {
+                _key(n): i for i, n in conn.execute(
+                    text("SELECT player_id, nickname FROM players WHERE group_id = :grp AND nickname IS NOT NULL"), params
+                )
+            }
+            self.games = {
+                _key(n): i for i, n in conn.execute(text("SELECT game_id, name FROM games WHERE group_id = :grp"), params)
+            }
+            self.sessions = dict(conn.execute(
+                text("SELECT date, MIN(session_id) FROM sessions WHERE group_id = :grp GROUP BY date"), params
+            ).all())
+        self.imported = 0
+        self.rejects = []  # (línea, motivo)
+
+    def _parse(self, row):
+        """Valida una fila y la traduce a ids (salvo host/sesión, que pueden ser nuevos)."""
+        if "_error" in row:
+            raise RowError(row["_error"])
+        try:
+            match_date = date.fromisoformat(str(row.get("date", "")).strip())
+        except ValueError:
+            raise RowError(f"fecha inválida: {row.get('date')!r}")
+
+        game_id = self.games.get(_key(row.get("game", "")))
+        if game_id is None:
+            raise RowError(f"juego desconocido: {row.get('game')!r}")
+
+        nicks = row.get("participants") or []
+        if not isinstance(nicks, list):
+            raise RowError(f"lista de jugadores inválida: {nicks!r}")
+        participants = []
+        for nick in nicks:
+            player_id = self.players.get(_key(nick))
+            if player_id is None:
+                raise RowError(f"jugador desconocido: {nick!r}")
+            if player_id in participants:
+                raise RowError(f"jugador repetido: {nick!r}")
+            participants.append(player_id)
+        if not participants:
+            raise RowError("la partida no tiene jugadores")
+
+        winner_id = self.players.get(_key(row.get("winner", "")))
+        if winner_id not in participants:
+            raise RowError(f"el ganador {row.get('winner')!r} no está en la mesa")
+
+        win_type = str(row.get("win_type") or history.WIN_NORMAL).strip()
+        if win_type not in history.WIN_TYPES:
+            raise RowError(f"tipo de victoria inválido: {win_type!r}")
+
+        food = row.get("food") or None
+        if food is not None and not isinstance(food, str):
+            raise RowError(f"comida inválida: {food!r}")
+
+        return {
+            "date": match_date,
+            "host": str(row.get("host") or "").strip(),
+            "game_id": game_id,
+            "winner_id": winner_id,
+            "participants": participants,
+            "win_type": win_type,
+            "duration": _optional_int(row.get("duration_minutes")),
+            "food": food,
+            "cost": _optional_int(row.get("cost_per_person")),
+            "attendees": _optional_int(row.get("total_attendees")),
+        }
+
+    def _resolve_sessions(self, conn, parsed):
+        """Crea las sesiones (y anfitriones) que el bloque necesita y todavía no existen."""
+        new_sessions = {}
+        for m in parsed:
+            if m["date"] in self.sessions or m["date"] in new_sessions:
+                continue
+            host_id = None
+            if m["host"]:
+                host_id = self.players.get(_key(m["host"]))
+                if host_id is None:
+                    host_id = conn.execute(SQL_INSERT_HOST, {"n": m["host"], "grp": self.group_id}).scalar_one()
+                    self.players[_key(m["host"])] = host_id
+            new_sessions[m["date"]] = (host_id, m["food"], m["cost"], m["attendees"])
+
+        if new_sessions:
+            dates = list(new_sessions)
+            result = conn.execute(SQL_INSERT_SESSIONS, {
+                "grp": self.group_id,
+                "dates": dates,
+                "hosts": [new_sessions[d][0] for d in dates],
+                "foods": [new_sessions[d][1] for d in dates],
+                "costs": [new_sessions[d][2] for d in dates],
+                "attendees": [new_sessions[d][3] for d in dates],
+            })
+            self.sessions.update({d: sid for sid, d in result})
+
+    def _load(self, conn, parsed):
+        """Inserta un bloque ya validado: 4-5 sentencias sin importar su tamaño."""
+        self._resolve_sessions(conn, parsed)
+        ids = conn.execute(SQL_RESERVE_MATCH_IDS, {"n": len(parsed)}).scalars().all()
+
+        conn.execute(SQL_INSERT_MATCHES, {
+            "grp": self.group_id,
+            "ids": ids,
+            "sessions": [self.sessions[m["date"]] for m in parsed],
+            "games": [m["game_id"] for m in parsed],
+            "winners": [m["winner_id"] for m in parsed],
+            "win_types": [m["win_type"] for m in parsed],
+            "durations": [m["duration"] for m in parsed],
+        })
+
+        part_matches, part_players, part_ranks = [], [], []
+        for match_id, m in zip(ids, parsed):
+            for player_id in m["participants"]:
+                part_matches.append(match_id)
+                part_players.append(player_id)
+                part_ranks.append(1 if player_id == m["winner_id"] else 2)
+        conn.execute(SQL_INSERT_PARTICIPANTS, {
+            "matches": part_matches, "players": part_players, "ranks": part_ranks,
+        })
+
+        stats.apply_matches(conn, ids)
+        return ids
+
+    def import_chunk(self, rows):
+        """Valida y carga un bloque de (línea, fila) en su propia transacción."""
+        parsed, lines = [], []
+        for line_no, row in rows:
+            try:
+                parsed.append(self._parse(row))
+                lines.append(line_no)
+            except RowError as e:
+                self.rejects.append((line_no, str(e)))
+        if not parsed:
+            return []
+
+        # Si la transacción falla, los ids nuevos de los mapas no existen en la base
+        players, sessions = dict(self.players), dict(self.sessions)
+        try:
+            with self.engine.begin() as conn:
+                ids = self._load(conn, parsed)
+        except Exception as e:
+            self.players, self.sessions = players, sessions
+            self.rejects.extend((line_no, f"error de base: {e}") for line_no in lines)
+            return []
+
+        self.imported += len(ids)
+        return ids
+
+    def run(self, rows, chunk_size=CHUNK_SIZE, on_chunk=None):
+        """Importa todas las filas por bloques. `on_chunk(importer)` se llama después de cada uno."""
+        for chunk in _chunks(rows, chunk_size):
+            self.import_chunk(chunk)
+            if on_chunk:
+                on_chunk(self)
+        return self
+
+
+def import_file(engine, stream, fmt, chunk_size=CHUNK_SIZE, on_chunk=None, group_id=1):
+    """Importa un archivo de texto ya abierto a una cofradía. Devuelve el Importer con el resultado."""
+    return Importer(engine, group_id).run(read_rows(stream, fmt), chunk_size, on_chunk)
+
+
+def detect_format(filename):
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def open_upload(uploaded_file):
+    """Envuelve un archivo subido desde Streamlit como texto para read_rows."""
+    # utf-8-sig: el "CSV UTF-8" de las planillas empieza con un BOM
+    return io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa partidas históricas desde CSV o JSONL")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="por defecto se deduce de la extensión")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--rejects", help="archivo CSV donde guardar las filas rechazadas")
+    parser.add_argument("--cofradia", help="slug de la cofradía (por defecto, DEFAULT_GROUP)")
+    args = parser.parse_args(argv)
+
+    from app import groups
+    from app.database import get_engine
+
+    fmt = args.format or detect_format(args.path)
+    engine = get_engine()
+    with engine.connect() as conn:
+        group_id = groups.group_id_for(conn, args.cofradia or groups.DEFAULT_GROUP)
+
+    def progress(importer):
+        print(f"  {importer.imported} partidas importadas, {len(importer.rejects)} rechazos", flush=True)
+
+    with open(args.path, newline="", encoding="utf-8-sig") as f:
+        result = import_file(engine, f, fmt, args.chunk_size, progress, group_id)
+
+    if args.rejects and result.rejects:
+        with open(args.rejects, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out)
+            writer.writerow(["line", "reason"])
+            writer.writerows(result.rejects)
+
+    print(f"Listo: {result.imported} partidas importadas, {len(result.rejects)} filas rechazadas.")
+    for line_no, reason in result.rejects[:20]:
+        print(f"  línea {line_no}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Salón de la Fama en vivo: avisos de partidas nuevas con LISTEN/NOTIFY.
+
+Cada partida insertada emite un NOTIFY (migración 009) con su cofradía y su
+juego. Un único hilo por proceso, con una conexión propia sacada del engine
+cacheado, escucha el canal y por cada aviso:
+
+  * invalida en data los tags "matches" de esa cofradía y el del juego, así
+    la próxima lectura trae lo nuevo (también si la partida la guardó otro
+    proceso, la cola de escritura o el importador);
+  * sube el número de versión de la cofradía.
+
+Los fragmentos en vivo se re-ejecutan cada CHECK_SECONDS, pero leen todo
+por el cache de data: mientras no llegue un aviso, un espectador no hace
+ninguna consulta. Con la versión cada sesión sabe si cambió algo desde la
+última vez que miró.
+"""
+import logging
+import os
+import select
+import threading
+import time
+
+import streamlit as st
+
+from app import data
+from app.database import _env_bool, get_engine
+
+logger = logging.getLogger(__name__)
+
+ENABLED = _env_bool("LIVE_UPDATES", True)
+CHANNEL = "matches_inserted"
+# Cada cuánto miran los fragmentos si cambió la versión (no consulta la base)
+CHECK_SECONDS = float(os.getenv("LIVE_CHECK_SECONDS", "3"))
+# Sin avisos, cada tanto se prueba la conexión (un SELECT 1 por proceso)
+KEEPALIVE_SECONDS = 60
+RETRY_SECONDS = 5
+
+
+def _socket(dbapi_conn):
+    # psycopg2 expone fileno(); pg8000 no, pero guarda el socket en _usock
+    return dbapi_conn if hasattr(dbapi_conn, "fileno") else dbapi_conn._usock
+
+
+def _receive(dbapi_conn):
+    """Lee los avisos que mandó el servidor. Devuelve sus payloads."""
+    if hasattr(dbapi_conn, "notifies"):
+        # psycopg2
+        dbapi_conn.poll()
+        payloads = [n.payload for n in dbapi_conn.notifies]
+        dbapi_conn.notifies.clear()
+    else:
+        # pg8000 solo procesa los mensajes del servidor al ejecutar algo
+        dbapi_conn.cursor().execute("SELECT 1")
+        payloads = [payload for _, _, payload in dbapi_conn.notifications]
+        dbapi_conn.notifications.clear()
+    return payloads
+
+
+class Listener(threading.Thread):
+    """Hilo que escucha el canal de partidas y lleva una versión por cofradía."""
+
+    def __init__(self, engine):
+        super().__init__(name="live-listener", daemon=True)
+        self.engine = engine
+        self._versions = {}
+        # Sube al reconectar: los avisos perdidos en el corte cuentan para todas
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def version(self, group_id):
+        with self._lock:
+            return self._generation, self._versions.get(group_id, 0)
+
+    def _connect(self):
+        conn = self.engine.raw_connection()
+        # Fuera del pool: la conexión queda tomada mientras viva el hilo
+        conn.detach()
+        dbapi_conn = conn.dbapi_connection
+        # El pre-ping del pool puede dejar una transacción abierta, y un
+        # LISTEN dentro de una transacción no rige hasta el commit
+        dbapi_conn.rollback()
+        dbapi_conn.autocommit = True
+        dbapi_conn.cursor().execute(f"LISTEN {CHANNEL}")
+        return dbapi_conn
+
+    def _dispatch(self, payload):
+        group_id, game_id = (int(part) for part in payload.split(":"))
+        data.invalidate("matches", group_id=group_id)
+        data.invalidate(f"game:{game_id}")
+        with self._lock:
+            self._versions[group_id] = self._versions.get(group_id, 0) + 1
+
+    def _missed(self):
+        data.invalidate("matches")
+        data.invalidate("game_stats")
+        with self._lock:
+            self._generation += 1
+
+    def run(self):
+        connected_once = False
+        dbapi_conn = None
+        while True:
+            try:
+                dbapi_conn = self._connect()
+                if connected_once:
+                    self._missed()
+                connected_once = True
+                while True:
+                    ready, _, _ = select.select([_socket(dbapi_conn)], [], [], KEEPALIVE_SECONDS)
+                    if not ready:
+                        dbapi_conn.cursor().execute("SELECT 1")
+                    for payload in _receive(dbapi_conn):
+                        self._dispatch(payload)
+            except Exception:
+                logger.exception("Conexión de avisos caída, reintentando en %s s", RETRY_SECONDS)
+                if dbapi_conn is not None:
+                    try:
+                        dbapi_conn.close()
+                    except Exception:
+                        pass
+                    dbapi_conn = None
+                time.sleep(RETRY_SECONDS)
+
+
+@st.cache_resource
+def get_listener():
+    """Arranca (una sola vez por proceso) el hilo que escucha los avisos."""
+    listener = Listener(get_engine())
+    listener.start()
+    return listener
+
+
+def version(group_id):
+    """Versión de la cofradía: cambia con cada aviso de partida nueva. No toca la base."""
+    return get_listener().version(group_id) if ENABLED else None
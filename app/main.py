@@ -1,10 +1,13 @@
+import uuid
+
+import altair as alt
 import streamlit as st
 import pandas as pd
 from sqlalchemy import text
 from datetime import date
-import time
 
-from app.database import get_engine 
+from app.database import get_engine, read_connection
+from app import analytics, awards, data, export, game_stats, groups, history, live, matches, rivalries, stats, telemetry, write_queue
 
 # --- CONFIGURACIÓN ---
 st.set_page_config(page_title="Noches de Caballeros", page_icon="⚔️", layout="wide")
@@ -24,26 +27,22 @@ with col_nav2:
     if st.button("📜 Ver Reglas"):
         st.switch_page("pages/rules.py")
 
-# CREAMOS LAS PESTAÑAS
-tab_sesion, tab_partida, tab_stats, tab_historial = st.tabs(["🫱🏻‍🫲🏻 Nueva Sesión", "📝 Cargar Partida", "🏆 Salón de la Fama", "📜 Historial"])
+# VISTAS
+# st.tabs solo oculta contenido: dibuja (y consulta) las cuatro pestañas en cada
+# rerun. Con un selector, cada rerun ejecuta únicamente la vista activa.
+VISTAS = ["🫱🏻‍🫲🏻 Nueva Sesión", "📝 Cargar Partida", "🏆 Salón de la Fama", "📜 Historial"]
 
 # ==============================================================================
 # PESTAÑA 1: NUEVA SESIÓN
 # ==============================================================================
-with tab_sesion:
+def render_sesion(group_id):
+    telemetry.set_origin("main:sesion")
     st.header("Planificar la Noche 🌙")
     st.caption("Primero crea la juntada, luego carga las partidas en la siguiente pestaña.")
     
     # Traemos los anfitriones (nicknames)
     try:
-        with engine.connect() as conn:
-            query_hosts = """
-                SELECT nickname, player_id 
-                FROM players 
-                WHERE active = TRUE OR role = 'Sede' 
-                ORDER BY nickname ASC
-            """
-            df_hosts = pd.read_sql(query_hosts, conn)
+        df_hosts = data.hosts(group_id)
     except Exception as e:
         st.error("Error de conexión.")
         st.stop()
@@ -78,51 +77,50 @@ with tab_sesion:
         submit_session = st.form_submit_button("🧝🏻‍♂️ Iniciar Cofradía")
     
     if submit_session:
+        if sess_host == opcion_nuevo and not new_host_name:
+            st.error("Debes ingresar un nombre para el nuevo lugar.")
+            st.stop()
         try:
             with engine.connect() as conn:
-                # Verificamos si ya existe una sesión esa fecha
-                check_query = text("SELECT session_id FROM sessions WHERE date = :d")
-                existing = conn.execute(check_query, {"d": sess_date}).fetchone()
-                
-                if existing:
-                    st.warning(f"Ya existe una cofradía registrada para el {sess_date.strftime('%d/%m/%Y')}. Ve a 'Cargar Partida' o usa otra fecha.")
-                else:
-                    # Si es nuevo host, lo insertamos primero
-                    final_host_id = None
-                    final_host_name = ""
-
+                with conn.begin() as tx:
+                    # Si es nuevo host, lo insertamos primero (misma transacción que la sesión)
                     if sess_host == opcion_nuevo:
-                        if new_host_name:
-                            # Insertar nuevo host
-                            insert_host_query = text("""
-                                INSERT INTO players (name, nickname, role, active, created_at, owned_games)
-                                VALUES (:n, :n, 'Sede', FALSE, NOW(), 0) 
-                                RETURNING player_id
-                            """)
-                            result = conn.execute(insert_host_query, {"n": new_host_name})
-                            final_host_id = result.fetchone()[0]
-                            final_host_name = new_host_name
-                        else:
-                            st.error("Debes ingresar un nombre para el nuevo lugar.")
-                            st.stop()
+                        insert_host_query = text("""
+                            INSERT INTO players (name, nickname, role, active, created_at, owned_games, group_id)
+                            VALUES (:n, :n, 'Sede', FALSE, NOW(), 0, :grp) 
+                            RETURNING player_id
+                        """)
+                        final_host_id = conn.execute(insert_host_query, {"n": new_host_name, "grp": group_id}).scalar_one()
+                        final_host_name = new_host_name
                     else:
                         final_host_id = host_map[sess_host]
                         final_host_name = sess_host
-                    
+
+                    # Una juntada por fecha y cofradía (índice único): si ya existe no se inserta
+                    # nada, sin la carrera de un SELECT previo entre dos pestañas abiertas
                     insert_query = text("""
-                        INSERT INTO sessions (date, host_id, food, cost_per_person, total_attendees)
-                        VALUES (:d, :h, :f, :c, :a)
+                        INSERT INTO sessions (date, host_id, food, cost_per_person, total_attendees, group_id)
+                        VALUES (:d, :h, :f, :c, :a, :grp)
+                        ON CONFLICT (group_id, date) DO NOTHING
+                        RETURNING session_id
                     """)
-                    conn.execute(insert_query, {
+                    session_id = conn.execute(insert_query, {
+                        "grp": group_id,
                         "d": sess_date,
-                        "h": host_map[sess_host],
+                        "h": final_host_id,
                         "f": sess_food,
                         "c": sess_cost,
                         "a": sess_attendees
-                    })
-                    conn.commit()
-                    st.success(f"Cofradía iniciada en casa de {sess_host}! Ahora pueden cargar partidas.")
-                    st.balloons()
+                    }).scalar()
+                    if session_id is None:
+                        tx.rollback() # Tampoco dejamos creado el lugar nuevo
+
+            if session_id is None:
+                st.warning(f"Ya existe una cofradía registrada para el {sess_date.strftime('%d/%m/%Y')}. Ve a 'Cargar Partida' o usa otra fecha.")
+            else:
+                data.invalidate("sessions", "players", group_id=group_id)
+                st.success(f"Cofradía iniciada en casa de {final_host_name}! Ahora pueden cargar partidas.")
+                st.balloons()
         except Exception as e:
             st.error(f"Error: {e}")
    
@@ -130,127 +128,248 @@ with tab_sesion:
 # PESTAÑA 2: CARGA DE DATOS
 # ==============================================================================
 
-with tab_partida:
+def render_partida(group_id):
+    telemetry.set_origin("main:partida")
     st.header("Registrar Nueva Batalla 🗡️🏹")
-    
-    # 1. Cargar datos auxiliares
+    if write_queue.ENABLED:
+        estado_cola(group_id)
+    form_partida(group_id)
+
+
+def _aviso_premio(winner_name, premio, nombres):
+    deudores = [nombres[i] for i in premio["debtors"] if i in nombres]
+    return (
+        f"¡{winner_name} alcanzó La Meta de los 5! +1 PV. "
+        f"Tributo de {awards.TRIBUTE_USD} USD: {', '.join(deudores) or 'nadie'}.",
+        "🏆",
+    )
+
+
+@st.fragment(run_every=2)
+def estado_cola(group_id):
+    """Indicador de la cola de escritura. Solo lee el journal local, no Postgres."""
+    pendientes = st.session_state.setdefault("partida_en_cola", {})
+    if pendientes:
+        nombres = {i: n for n, i in data.form_lookup(group_id, 10).player_ids.items()}
+        for key, entry in write_queue.status(list(pendientes)).items():
+            if entry["status"] == "pending":
+                continue
+            winner_name = pendientes.pop(key)
+            if entry["status"] == "done":
+                st.toast(f"Partida de {winner_name} grabada.", icon="✅")
+                if entry["result"]:
+                    st.toast(*_aviso_premio(winner_name, entry["result"], nombres))
+                    st.balloons()
+            else:
+                st.toast(f"No se pudo grabar la partida de {winner_name}: {entry['error']}", icon="⚠️")
+
+    total = write_queue.counts()
+    if total["pending"]:
+        st.caption(f"⏳ Cola de escritura: {total['pending']} partidas por grabar")
+    else:
+        st.caption("✔️ Cola de escritura al día")
+    if total["failed"]:
+        st.caption(f"⚠️ {total['failed']} partidas con error en la cola (ver `python -m app.write_queue status`)")
+
+
+def _guardar_partida(group_id, session_id, player_map, game_map):
+    """Callback del botón Guardar: corre antes del rerun del fragmento.
+
+    Al correr antes de dibujar los widgets puede limpiar la mesa desde
+    session_state, sin st.rerun() ni esperas para que se lea el mensaje.
+    """
+    players_selected = st.session_state.partida_jugadores
+    winner_name = st.session_state.partida_ganador
+    if not players_selected:
+        st.session_state.partida_error = "⚠️ Faltan jugadores."
+        return
+    if not winner_name:
+        st.session_state.partida_error = "⚠️ Debes elegir un ganador."
+        return
+    if winner_name not in players_selected:
+        st.session_state.partida_error = "⚠️ El ganador debe estar en la mesa."
+        return
+
+    # Limpiamos la mesa al guardar (juntada, juego y duración quedan para la próxima)
+    if write_queue.ENABLED:
+        # Write-behind: se anota en el journal y el hilo de la cola la graba
+        key = st.session_state.pop("partida_token")
+        write_queue.enqueue(
+            key, group_id, session_id,
+            game_map[st.session_state.partida_juego],
+            player_map[winner_name],
+            st.session_state.partida_intensidad,
+            st.session_state.partida_duracion,
+            [player_map[p] for p in players_selected],
+        )
+        st.session_state.setdefault("partida_en_cola", {})[key] = winner_name
+        st.session_state.partida_avisos = [("Partida en cola, se graba en segundos...", "⏳")]
+        st.session_state.partida_jugadores = []
+        return
+
+    # Si falla, la clave se conserva: el reintento no puede duplicar la partida
+    key = st.session_state.partida_token
     try:
         with engine.connect() as conn:
-            # 1. Traer Sesiones Disponibles (Últimas 10)
-            # Mostramos: "Fecha - Casa de [Host]"
-            sessions_query = """
-                SELECT s.session_id, s.date, p.nickname as host 
-                FROM sessions s
-                JOIN players p ON s.host_id = p.player_id
-                ORDER BY s.date DESC LIMIT 10
-            """
-            df_sessions = pd.read_sql(sessions_query, conn)
-
-            df_players = pd.read_sql("SELECT player_id, nickname FROM players WHERE active = TRUE", conn)
-            df_games = pd.read_sql("SELECT game_id, name FROM games WHERE name <> 'Jugar con tu señora'", conn)
+            with conn.begin():
+                # Partida + participantes + player_stats en un solo viaje
+                match_id = matches.record_match(
+                    conn, session_id,
+                    game_map[st.session_state.partida_juego],
+                    player_map[winner_name],
+                    st.session_state.partida_intensidad,
+                    st.session_state.partida_duracion,
+                    [player_map[p] for p in players_selected],
+                    submission_key=key,
+                )
+                # La Meta de los 5 (misma transacción)
+                premio = awards.apply_match(conn, match_id) if match_id else None
+    except Exception as e:
+        st.session_state.partida_error = f"Error grabando partida: {e}"
+        return
+
+    del st.session_state.partida_token
+    st.session_state.partida_jugadores = []
+    if match_id is None:
+        st.session_state.partida_avisos = [("Esa partida ya estaba registrada.", "ℹ️")]
+        return
+
+    data.invalidate("matches", group_id=group_id)
+    data.invalidate(f"game:{game_map[st.session_state.partida_juego]}")
+    analytics.match_recorded()
+
+    avisos = [("Partida registrada! Seguimos jugando...", "✅")]
+    if premio:
+        avisos.append(_aviso_premio(winner_name, premio, {i: n for n, i in player_map.items()}))
+        st.session_state.partida_festejo = True
+    st.session_state.partida_avisos = avisos
+
+
+@st.fragment
+def form_partida(group_id):
+    """Formulario de carga como fragmento: sus widgets solo re-ejecutan esta función."""
+    telemetry.set_origin("main:partida")
+
+    # Clave de idempotencia del envío: se renueva después de cada guardado
+    st.session_state.setdefault("partida_token", uuid.uuid4().hex)
+
+    # Confirmación del guardado (no bloquea: el toast se va solo)
+    for msg, icon in st.session_state.pop("partida_avisos", []):
+        st.toast(msg, icon=icon)
+    if st.session_state.pop("partida_festejo", False):
+        st.balloons()
+
+    # 1. Cargar datos auxiliares: sesiones (últimas 10), jugadores y juegos en una sola consulta (cacheada)
+    try:
+        lookup = data.form_lookup(group_id, 10)
     except Exception as e:
         st.error(f"Error cargando listas: {e}")
         st.stop()
 
-    if df_sessions.empty:
+    if not lookup.session_labels:
         st.warning("No hay sesiones activas. Crea una en la pestaña 'Nueva Sesión' antes de cargar partidas.")
-    else:
-        # Crear lista legible para el dropdown de sesiones
-        df_sessions['label'] = df_sessions.apply(lambda x: f"{x['date'].strftime('%d/%m/%Y')}  -📍 {x['host']}", axis=1)
-        session_map = dict(zip(df_sessions['label'], df_sessions['session_id']))
-        
-        player_map = dict(zip(df_players['nickname'], df_players['player_id']))
-        game_map = dict(zip(df_games['name'], df_games['game_id']))
+        return
 
-        # Formulario de carga de partida
-        col1, col2 = st.columns(2)
-        with col1:
-            selected_session_label = st.selectbox("Seleccionar Juntada", options=df_sessions['label'])
-            game_name = st.selectbox("Juego", options=df_games['name'])
-        
-        with col2:
-            duration = st.number_input("Duración (minutos) ⏱️", min_value=5, value=45, step=5)
-            win_type = st.select_slider("Intensidad", options=["Normal", "Clutch (Sufrida)", "Paliza"], value="Normal")
+    # Formulario de carga de partida
+    col1, col2 = st.columns(2)
+    with col1:
+        selected_session_label = st.selectbox("Seleccionar Juntada", options=lookup.session_labels, key="partida_juntada")
+        st.selectbox("Juego", options=lookup.playable_games, key="partida_juego")
+    
+    with col2:
+        st.number_input("Duración (minutos) ⏱️", min_value=5, value=45, step=5, key="partida_duracion")
+        st.select_slider("Intensidad", options=history.WIN_TYPES, value=history.WIN_NORMAL, key="partida_intensidad")
 
-        st.divider()
+    st.divider()
 
-        # 1. Seleccionamos jugadores..
-        players_selected = st.multiselect("Jugadores en la mesa", options=df_players['nickname'])
-        
-        # Si no hay jugadores seleccionados, mostramos un mensaje o lista vacía
-        winner_options = players_selected if players_selected else []
-        
-        # 2. Deshabilitamos el selector si no hay jugadores para evitar errores visuales
-        winner_name = st.selectbox("Ganador", options=winner_options, disabled=not players_selected)
-        
-        st.divider()
-
-        # Botón normal
-        if st.button("💾 Guardar Partida", type="secondary", width=200):
-            if not players_selected:
-                st.warning("⚠️ Faltan jugadores.")
-            elif not winner_name:
-                st.warning("⚠️ Debes elegir un ganador.")
-            elif winner_name not in players_selected:
-                st.error("⚠️ El ganador debe estar en la mesa.")
-            else:
-                try:
-                    session_id = session_map[selected_session_label]
-                    game_id = game_map[game_name]
-                    winner_id = player_map[winner_name]
-                    
-                    with engine.connect() as conn:
-                        with conn.begin():
-                            # Insertar Match
-                            q_match = text("""
-                                INSERT INTO matches (session_id, game_id, winner_id, win_type, duration_minutes) 
-                                VALUES (:s, :g, :w, :wt, :dur) RETURNING match_id
-                            """)
-                            match_id = conn.execute(q_match, {
-                                "s": session_id, "g": game_id, "w": winner_id, "wt": win_type, "dur": duration
-                            }).fetchone()[0]
-                            
-                            # Insertar Participantes
-                            q_part = text("INSERT INTO match_participants (match_id, player_id, rank) VALUES (:m, :p, :r)")
-                            for p in players_selected:
-                                rank = 1 if p == winner_name else 2
-                                conn.execute(q_part, {"m": match_id, "p": player_map[p], "r": rank})
-                                
-                    st.success("✅ Partida registrada! Seguimos jugando...")
-                    time.sleep(1) 
-                    st.rerun() # Limpiamos la pantalla
-                except Exception as e:
-                    st.error(f"Error grabando partida: {e}")
+    # 1. Seleccionamos jugadores..
+    players_selected = st.multiselect("Jugadores en la mesa", options=lookup.player_names, key="partida_jugadores")
+    
+    # Si no hay jugadores seleccionados, mostramos un mensaje o lista vacía
+    winner_options = players_selected if players_selected else []
+    
+    # 2. Deshabilitamos el selector si no hay jugadores para evitar errores visuales
+    st.selectbox("Ganador", options=winner_options, disabled=not players_selected, key="partida_ganador")
+    
+    st.divider()
+
+    session_id = lookup.session_ids[selected_session_label]
+
+    # El guardado va en el callback: al terminar solo se redibuja este fragmento
+    st.button(
+        "💾 Guardar Partida", type="secondary", width=200,
+        on_click=_guardar_partida, args=(group_id, session_id, lookup.player_ids, lookup.game_ids),
+    )
+    error = st.session_state.pop("partida_error", None)
+    if error:
+        st.error(error)
+
+    # Lo único que cambia al guardar: las partidas de esta juntada
+    df_noche = data.cached_read(
+        matches.SQL_SESSION_RECENT, tags=["matches"], params={"group_id": group_id, "s": session_id, "limit": 5}
+    )
+    total_noche = int(df_noche["total"].iloc[0]) if not df_noche.empty else 0
+    st.caption(f"🎲 Partidas registradas en esta juntada: {total_noche}")
+    if not df_noche.empty:
+        st.dataframe(df_noche.drop(columns=["match_id", "total"]), hide_index=True, use_container_width=True)
 
 # ==============================================================================
 # PESTAÑA 3: ESTADÍSTICAS
 # ==============================================================================
-with tab_stats:
+def render_stats(group_id):
     st.header("Estadísticas Generales 📊")
-    
-    # QUERY: Calcula todo en SQL directamente
-    sql_stats = """
-    SELECT 
-        p.nickname as "Caballero",
-        COUNT(mp.match_id) as "Partidas Jugadas",
-        SUM(CASE WHEN mp.rank = 1 THEN 1 ELSE 0 END) as "Victorias",
-        SUM(CASE WHEN mp.rank = 2 THEN 1 ELSE 0 END) as "Subcampeonatos"
-    FROM players p
-    JOIN match_participants mp ON p.player_id = mp.player_id
-    GROUP BY p.nickname
-    ORDER BY "Victorias" DESC, "Subcampeonatos" DESC
+    # En un rerun completo la tabla ya sale al día: el aviso es solo para los refrescos solos
+    st.session_state[f"stats_version_{group_id}"] = live.version(group_id)
+    tabla_en_vivo(group_id)
+    analisis(group_id)
+
+
+@st.fragment(run_every=live.CHECK_SECONDS if live.ENABLED else None)
+def tabla_en_vivo(group_id):
+    """Posiciones y La Meta de los 5, al día sin que el espectador toque nada.
+
+    Se re-ejecuta sola cada tanto, pero lee por el cache de data, que el
+    hilo de live invalida cuando llega una partida: sin partidas nuevas no
+    hay consultas. Lee del primario: un aviso puede llegar antes de que la
+    réplica tenga la partida.
     """
-    
+    telemetry.set_origin("main:stats")
+    version = live.version(group_id)
+    if st.session_state.get(f"stats_version_{group_id}", version) != version:
+        st.toast("¡Partida nueva! Tabla actualizada.", icon="🎲")
+    st.session_state[f"stats_version_{group_id}"] = version
+
+    periodos = ["Histórico", "Temporada", "Mes", "Últimas juntadas"]
+    periodo = st.segmented_control("Período", periodos, default=periodos[0], key="stats_periodo")
+
     try:
-        with engine.connect() as conn:
-            df_stats = pd.read_sql(sql_stats, conn)
+        if periodo in (None, "Histórico"):
+            # QUERY: Lee el resumen por jugador (player_stats), no la tabla de hechos
+            df_stats = data.cached_read(
+                stats.SQL_LEADERBOARD, tags=["matches", "players", "analytics"], params={"group_id": group_id},
+            )
+        else:
+            # Ventana: suma los resúmenes por juntada (player_session_stats) del rango
+            date_from, date_to = elegir_periodo(periodo, group_id)
+            df_stats = data.cached_read(
+                stats.SQL_PERIOD_LEADERBOARD, tags=["matches", "players"],
+                params={"group_id": group_id, "date_from": date_from, "date_to": date_to},
+            )
             
         if not df_stats.empty:
             # Cálculo de Win Rate con Pandas
             df_stats["Win Rate %"] = ((df_stats["Victorias"] / df_stats["Partidas Jugadas"]) * 100).round(1)
+
+            # Racha en curso y forma (últimas partidas de cada uno, sin importar el período)
+            df_form = stats.form_metrics(data.cached_read(
+                stats.SQL_RECENT_FORM, tags=["matches"],
+                params={"group_id": group_id, "n": stats.STREAK_LOOKBACK},
+            ))
+            df_stats = df_stats.merge(df_form, on="player_id", how="left")
+            df_stats["Racha"] = df_stats["Racha"].fillna(0).astype(int)
             
             # KPI Cards (Top Metrics)
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             
             top_winner = df_stats.iloc[0]
             col1.metric("👑 El Rey Actual", top_winner["Caballero"], f"{int(top_winner['Victorias'])} Victorias")
@@ -260,6 +379,9 @@ with tab_stats:
             
             mas_activo = df_stats.sort_values("Partidas Jugadas", ascending=False).iloc[0]
             col3.metric("⚔️ El Más Activo", mas_activo["Caballero"], f"{int(mas_activo['Partidas Jugadas'])} Partidas")
+
+            en_racha = df_stats.sort_values("Racha", ascending=False).iloc[0]
+            col4.metric("🔥 En Racha", en_racha["Caballero"], f"{int(en_racha['Racha'])} victorias seguidas")
             
             st.divider()
             
@@ -267,7 +389,7 @@ with tab_stats:
             st.subheader("Tabla de Posiciones")
             # Reordenamos columnas para que quede lindo
             st.dataframe(
-                df_stats[["Caballero", "Victorias", "Win Rate %", "Subcampeonatos", "Partidas Jugadas"]],
+                df_stats[["Caballero", "Victorias", "Win Rate %", "Rating", "Forma", "Racha", "Subcampeonatos", "Partidas Jugadas", "Última Partida"]],
                 use_container_width=True,
                 hide_index=True
             )
@@ -277,21 +399,298 @@ with tab_stats:
     except Exception as e:
         st.error(f"Error calculando stats: {e}")
 
+    # --- LA META DE LOS 5 ---
+    st.divider()
+    st.subheader("🏆 La Meta de los 5")
+    try:
+        df_awards = data.cached_read(awards.SQL_STANDINGS, tags=["matches", "players", "awards"], params={"group_id": group_id})
+        if df_awards.empty:
+            st.info("Todavía nadie empezó su racha.")
+        else:
+            st.dataframe(
+                df_awards,
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "Victorias en Racha": st.column_config.ProgressColumn(min_value=0, max_value=awards.AWARD_WINS, format="%d / 5"),
+                },
+            )
+    except Exception as e:
+        st.error(f"Error leyendo premios: {e}")
+
+
+# --- ANALÍTICA (vistas materializadas, refrescadas en segundo plano) ---
+@st.fragment
+def analisis(group_id):
+    telemetry.set_origin("main:stats")
+    st.divider()
+    st.subheader("Análisis de la Cofradía 🔎")
+    try:
+        analytics.get_scheduler()
+        as_of = analytics.as_of()
+        if as_of is not None:
+            st.caption(f"Datos al {pd.Timestamp(as_of).strftime('%d/%m/%Y %H:%M')} (se actualizan solos cada tanto).")
+
+        with st.expander("🎲 Win Rate por Juego"):
+            df_wr = analytics.game_win_rates(group_id)
+            if df_wr.empty:
+                st.info("Sin datos todavía.")
+            else:
+                st.dataframe(
+                    df_wr.pivot_table(index="caballero", columns="juego", values="win_rate", aggfunc="max"),
+                    use_container_width=True
+                )
+
+        with st.expander("🧮 Análisis por Juego"):
+            render_juegos(group_id)
+
+        with st.expander("⚔️ Rivalidades"):
+            render_rivalidades(group_id)
+
+        with st.expander("🌙 Últimas Juntadas"):
+            st.dataframe(analytics.session_summary(group_id), hide_index=True, use_container_width=True)
+
+        with st.expander("📈 Totales por Caballero"):
+            st.dataframe(analytics.player_totals(group_id), hide_index=True, use_container_width=True)
+    except Exception as e:
+        st.error(f"Error leyendo analítica: {e}")
+
+def elegir_periodo(periodo, group_id):
+    """Widgets del período elegido. Devuelve el rango de fechas [desde, hasta)."""
+    meses = data.cached_read(stats.SQL_MONTHS, tags=["sessions"], params={"group_id": group_id}, replica=True)["month"]
+    if meses.empty:
+        return stats.period_bounds(None)
+    if periodo == "Temporada":
+        temporadas = sorted({m.year for m in meses}, reverse=True)
+        return stats.period_bounds("season", st.selectbox("Temporada", temporadas, key="stats_temporada"))
+    if periodo == "Mes":
+        mes = st.selectbox("Mes", meses.tolist(), format_func=lambda m: m.strftime("%m/%Y"), key="stats_mes")
+        return stats.period_bounds("month", mes)
+    n = st.number_input("Cantidad de juntadas", min_value=1, max_value=100, value=5, step=1, key="stats_ultimas")
+    desde = data.cached_read(
+        stats.SQL_LAST_SESSIONS_FROM, tags=["sessions"], params={"group_id": group_id, "n": n}, replica=True
+    )
+    return desde["date_from"].iloc[0], stats.period_bounds(None)[1]
+
+
+def render_juegos(group_id):
+    """Duraciones, tipos de victoria, tamaño de mesa y reparto de victorias por juego."""
+    df_games = data.games(group_id)
+    nombres_juego = dict(zip(df_games["game_id"], df_games["name"]))
+    df_players = data.all_players(group_id)
+    nombres = dict(zip(df_players["player_id"], df_players["nickname"]))
+
+    df_overview = game_stats.overview(df_games["game_id"].tolist())
+    if df_overview.empty:
+        st.info("Sin datos todavía.")
+        return
+    df_overview.insert(0, "Juego", df_overview["game_id"].map(nombres_juego))
+    df_overview["Más Ganador"] = df_overview["top_winner_id"].map(nombres)
+    st.dataframe(
+        df_overview.drop(columns=["game_id", "top_winner_id"]).rename(columns={
+            "matches": "Partidas",
+            "avg_duration": "Duración Prom.",
+            "p50_duration": "Duración p50",
+            "p90_duration": "Duración p90",
+            "clutch_pct": "Clutch %",
+            "paliza_pct": "Paliza %",
+            "avg_table_size": "Jugadores Prom.",
+            "distinct_winners": "Ganadores Distintos",
+            "top_winner_pct": "% del Más Ganador",
+        }),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+    juego = st.selectbox(
+        "Detalle del juego", df_overview["game_id"].tolist(),
+        format_func=lambda g: nombres_juego.get(g, str(g)), key="juegos_detalle",
+    )
+    report = game_stats.game_report([juego])[juego]
+    col1, col2 = st.columns(2)
+    with col1:
+        st.caption("Por cantidad de jugadores (no hay orden de asiento: parejo = 1 / jugadores)")
+        st.dataframe(
+            report["by_size"].rename(columns={
+                "table_size": "Jugadores",
+                "matches": "Partidas",
+                "avg_duration": "Duración Prom.",
+                "clutch_pct": "Clutch %",
+                "paliza_pct": "Paliza %",
+                "parejo_pct": "Win Rate Parejo %",
+            }),
+            hide_index=True,
+            use_container_width=True,
+        )
+    with col2:
+        st.caption("Reparto de victorias")
+        winners = report["winners"].assign(Caballero=report["winners"]["winner_id"].map(nombres))
+        st.bar_chart(winners, x="Caballero", y="share_pct", y_label="% de las victorias", horizontal=True)
+
+
+def render_rivalidades(group_id):
+    """Mapa de calor de cara a cara: al día con la última partida, sin consultas si no hubo nuevas."""
+    matrix = rivalries.get_matrix(group_id)
+    matrix.update()
+    played = matrix.played()
+    if played.empty:
+        st.info("Sin datos todavía.")
+        return
+
+    df_players = data.all_players(group_id)
+    nombres = dict(zip(df_players["player_id"], df_players["nickname"]))
+    # Por defecto, los más activos: con cientos de caballeros el mapa completo no se lee
+    activos = played.sort_values(ascending=False).index[:15]
+    elegidos = st.multiselect(
+        "Caballeros", options=played.index.tolist(), default=activos.tolist(),
+        format_func=lambda i: nombres.get(i, str(i)), key="rivalidades_jugadores",
+    )
+    df_riv = matrix.frame(elegidos)
+    if df_riv.empty:
+        st.info("Elegí al menos dos caballeros que hayan compartido mesa.")
+        return
+
+    df_riv["caballero"] = df_riv["player_id"].map(nombres)
+    df_riv["rival"] = df_riv["rival_id"].map(nombres)
+    df_riv["win_rate"] = (df_riv["wins"] / df_riv["shared"] * 100).round(1)
+    st.caption("Fila contra columna: % de las partidas compartidas que ganó la fila.")
+    heatmap = alt.Chart(df_riv).mark_rect().encode(
+        x=alt.X("rival:N", title="Rival"),
+        y=alt.Y("caballero:N", title="Caballero"),
+        color=alt.Color("win_rate:Q", title="Win Rate %", scale=alt.Scale(scheme="redyellowgreen", domain=[0, 100])),
+        tooltip=[
+            alt.Tooltip("caballero:N", title="Caballero"),
+            alt.Tooltip("rival:N", title="Rival"),
+            alt.Tooltip("shared:Q", title="Partidas juntos"),
+            alt.Tooltip("wins:Q", title="Ganó"),
+            alt.Tooltip("rival_wins:Q", title="Ganó el rival"),
+            alt.Tooltip("win_rate:Q", title="Win Rate %"),
+        ],
+    )
+    st.altair_chart(heatmap, use_container_width=True)
+
 # ==============================================================================
 # PESTAÑA 4: HISTORIAL
 # ==============================================================================
-with tab_historial:
+def render_historial(group_id):
+    telemetry.set_origin("main:historial")
     st.header("Historial de Batallas 📜")
     try:
-        with engine.connect() as conn:
-            historial = pd.read_sql("""
-                SELECT s.date as Fecha, m.duration_minutes as Duración, g.name as Juego, p.nickname as Ganador, m.win_type AS "Tipo de Victoria"
-                FROM matches m
-                JOIN games g ON m.game_id = g.game_id
-                JOIN players p ON m.winner_id = p.player_id
-                JOIN sessions s ON m.session_id = s.session_id
-                ORDER BY m.match_id DESC
-            """, conn)
-            st.dataframe(historial, hide_index=True, use_container_width=True)
+        df_hist_games = data.games(group_id)
+        df_hist_players = data.all_players(group_id)
+    except Exception as e:
+        st.error(f"Error: {e}")
+        st.stop()
+
+    todos = "Todos"
+    hist_game_map = dict(zip(df_hist_games['name'], df_hist_games['game_id']))
+    hist_player_map = dict(zip(df_hist_players['nickname'], df_hist_players['player_id']))
+
+    # Filtros (se resuelven en SQL, no en pandas)
+    col_f1, col_f2, col_f3, col_f4, col_f5 = st.columns(5)
+    f_desde = col_f1.date_input("Desde", value=None, format="DD/MM/YYYY", key="hist_desde")
+    f_hasta = col_f2.date_input("Hasta", value=None, format="DD/MM/YYYY", key="hist_hasta")
+    f_juego = col_f3.selectbox("Juego", [todos] + df_hist_games['name'].tolist(), key="hist_juego")
+    f_ganador = col_f4.selectbox("Ganador", [todos] + df_hist_players['nickname'].tolist(), key="hist_ganador")
+    f_tipo = col_f5.selectbox("Tipo de Victoria", [todos] + history.WIN_TYPES, key="hist_tipo")
+
+    filtros = {
+        "date_from": f_desde,
+        "date_to": f_hasta,
+        "game_id": hist_game_map.get(f_juego),
+        "winner_id": hist_player_map.get(f_ganador),
+        "win_type": None if f_tipo == todos else f_tipo,
+    }
+
+    # Pila de cursores: cada elemento es el "before" de una página ya visitada.
+    # Si cambian los filtros volvemos a la primera página.
+    firma = (group_id, *filtros.values())
+    if st.session_state.get("hist_firma") != firma:
+        st.session_state.hist_firma = firma
+        st.session_state.hist_cursores = [None]
+
+    try:
+        with read_connection() as conn:
+            historial, next_cursor = history.fetch_page(
+                conn, group_id, before=st.session_state.hist_cursores[-1], **filtros
+            )
     except Exception as e:
         st.error(f"Error: {e}")
+        st.stop()
+
+    if historial.empty:
+        st.info("No hay partidas para esos filtros.")
+    else:
+        st.dataframe(historial.drop(columns=["match_id"]), hide_index=True, use_container_width=True)
+
+    col_p1, col_p2, col_p3 = st.columns([1, 2, 1])
+    pagina = len(st.session_state.hist_cursores)
+    col_p2.caption(f"Página {pagina}")
+    if col_p1.button("⬅️ Más recientes", disabled=pagina == 1):
+        st.session_state.hist_cursores.pop()
+        st.rerun()
+    if col_p3.button("Más antiguas ➡️", disabled=next_cursor is None):
+        st.session_state.hist_cursores.append(next_cursor)
+        st.rerun()
+
+
+# ==============================================================================
+# MODO OFFLINE (snapshot Parquet, sin Postgres)
+# ==============================================================================
+@st.cache_data(show_spinner=False)
+def _offline_board(snapshot, version, date_from, date_to, group_id):
+    # `version` (fecha de la última exportación) invalida el cache si se actualiza el snapshot
+    return export.offline_leaderboard(snapshot, date_from, date_to, group_id)
+
+
+@st.cache_data(show_spinner=False)
+def _offline_seasons(snapshot, version):
+    fechas = pd.to_datetime(export.read_table("sessions", snapshot)["date"])
+    return sorted(fechas.dt.year.dropna().astype(int).unique().tolist(), reverse=True)
+
+
+def render_stats_offline():
+    st.header("Estadísticas Generales 📊")
+    snapshot = export.OFFLINE_SNAPSHOT
+    runs = export.read_manifest(snapshot)["runs"]
+    version = runs[-1]["at"] if runs else None
+    st.info(f"Modo offline de solo lectura: datos del snapshot del {version or '(sin fecha)'}.")
+    df_groups = export.offline_groups(snapshot)
+    group_id = groups.current_group(df_groups)[0] if df_groups is not None else None
+
+    temporada = st.selectbox("Período", ["Histórico"] + _offline_seasons(snapshot, version), key="offline_periodo")
+    if temporada == "Histórico":
+        date_from, date_to = None, None
+    else:
+        date_from, date_to = stats.period_bounds("season", temporada)
+    df_stats = _offline_board(snapshot, version, date_from, date_to, group_id)
+    if df_stats.empty:
+        st.info("El snapshot no tiene partidas para ese período.")
+        return
+    df_stats["Win Rate %"] = ((df_stats["Victorias"] / df_stats["Partidas Jugadas"]) * 100).round(1)
+    st.dataframe(
+        df_stats[["Caballero", "Victorias", "Win Rate %", "Subcampeonatos", "Partidas Jugadas", "Última Partida"]],
+        use_container_width=True,
+        hide_index=True
+    )
+
+
+if export.OFFLINE_SNAPSHOT:
+    render_stats_offline()
+    st.stop()
+
+# ==============================================================================
+# NAVEGACIÓN ENTRE VISTAS
+# ==============================================================================
+group_id, _ = groups.current_group()
+vista = st.segmented_control("Vista", VISTAS, default=VISTAS[0], key="vista", label_visibility="collapsed")
+st.divider()
+
+if vista == VISTAS[1]:
+    render_partida(group_id)
+elif vista == VISTAS[2]:
+    render_stats(group_id)
+elif vista == VISTAS[3]:
+    render_historial(group_id)
+else:
+    render_sesion(group_id)
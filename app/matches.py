@@ -0,0 +1,119 @@
+"""Registro de partidas en un solo viaje a la base.
+
+La partida, sus participantes y los resúmenes (player_stats y
+player_session_stats) se insertan con una única sentencia (CTEs
+encadenadas), en lugar de un INSERT por jugador.
+
+Cada envío puede traer una clave de idempotencia (`submission_key`, única
+en la tabla): si la partida ya se grabó con esa clave, el INSERT no hace
+nada y tampoco se tocan participantes ni resúmenes.
+
+La partida queda en la cofradía de su juntada (matches.group_id se copia
+de sessions en el mismo INSERT).
+"""
+from sqlalchemy import text
+
+from app import stats
+
+# --- LECTURAS INCREMENTALES ---
+# Quien procesa partidas de a tandas guarda la foto con la que leyó
+# (SQL_SNAPSHOT, dentro de la misma transacción o sentencia que la lectura)
+# y la próxima vez pide unseen(...): las filas que en esa foto no se veían.
+# No depende del orden de match_id (migración 012).
+
+# Foto en la que no se ve ninguna fila: para arrancar desde cero
+SNAPSHOT_EMPTY = "1:1:"
+
+SQL_SNAPSHOT = "SELECT CAST(pg_current_snapshot() AS TEXT)"
+
+
+def unseen(column, param="seen", snapshot_column=None):
+    """Condición SQL: la transacción en `column` no estaba confirmada en la foto :param.
+
+    Con `snapshot_column` la foto sale de esa columna (texto) en vez de un parámetro.
+    """
+    snapshot = f"CAST({snapshot_column or ':' + param} AS pg_snapshot)"
+    return f"({column} >= pg_snapshot_xmin({snapshot}) AND NOT pg_visible_in_snapshot({column}, {snapshot}))"
+
+
+SQL_RECORD_MATCH = text("""
+    WITH new_match AS (
+        INSERT INTO matches (session_id, game_id, winner_id, win_type, duration_minutes, submission_key, group_id)
+        VALUES (:s, :g, :w, :wt, :dur, :key, (SELECT group_id FROM sessions WHERE session_id = :s))
+        ON CONFLICT (submission_key) DO NOTHING
+        RETURNING match_id, session_id
+    ),
+    participants AS (
+        SELECT t.player_id, CASE WHEN t.player_id = :w THEN 1 ELSE 2 END AS rank
+        FROM unnest(CAST(:players AS INTEGER[])) AS t(player_id)
+    ),
+    new_participants AS (
+        INSERT INTO match_participants (match_id, player_id, rank)
+        SELECT nm.match_id, pa.player_id, pa.rank
+        FROM new_match nm CROSS JOIN participants pa
+    ),
+    new_stats AS (
+        INSERT INTO player_stats AS ps (player_id, matches_played, wins, runner_ups, last_played)
+        SELECT
+            pa.player_id,
+            1,
+            CASE WHEN pa.rank = 1 THEN 1 ELSE 0 END,
+            CASE WHEN pa.rank = 2 THEN 1 ELSE 0 END,
+            s.date
+        FROM participants pa
+        CROSS JOIN new_match nm
+        LEFT JOIN sessions s ON s.session_id = nm.session_id
+""" + stats.ON_CONFLICT_ACCUMULATE + """
+    ),
+    new_session_stats AS (
+        INSERT INTO player_session_stats AS pss (player_id, session_id, session_date, group_id, matches_played, wins, runner_ups)
+        SELECT
+            pa.player_id,
+            s.session_id,
+            s.date,
+            s.group_id,
+            1,
+            CASE WHEN pa.rank = 1 THEN 1 ELSE 0 END,
+            CASE WHEN pa.rank = 2 THEN 1 ELSE 0 END
+        FROM participants pa
+        CROSS JOIN new_match nm
+        JOIN sessions s ON s.session_id = nm.session_id
+""" + stats.ON_CONFLICT_ACCUMULATE_SESSION + """
+    )
+    SELECT match_id FROM new_match
+""")
+
+# Últimas partidas de una juntada (con el total de la noche), para refrescar tras guardar
+SQL_SESSION_RECENT = """
+    SELECT
+        m.match_id,
+        g.name AS "Juego",
+        p.nickname AS "Ganador",
+        m.win_type AS "Tipo de Victoria",
+        m.duration_minutes AS "Duración",
+        COUNT(*) OVER () AS total
+    FROM matches m
+    JOIN games g ON g.game_id = m.game_id
+    JOIN players p ON p.player_id = m.winner_id
+    WHERE m.group_id = :group_id AND m.session_id = :s
+    ORDER BY m.match_id DESC
+    LIMIT :limit
+"""
+
+
+def record_match(conn, session_id, game_id, winner_id, win_type, duration, player_ids, submission_key=None):
+    """Inserta la partida con todos sus participantes y devuelve el match_id.
+
+    El ganador queda con rank 1 y el resto con rank 2. Es una sola sentencia,
+    así que es atómica por sí misma y también dentro de un `conn.begin()`.
+    Devuelve None si `submission_key` ya estaba registrada (reintento).
+    """
+    return conn.execute(SQL_RECORD_MATCH, {
+        "s": session_id,
+        "g": game_id,
+        "w": winner_id,
+        "wt": win_type,
+        "dur": duration,
+        "players": list(player_ids),
+        "key": submission_key,
+    }).scalar()
@@ -0,0 +1,215 @@
+"""Migraciones versionadas del esquema y chequeo de planes de ejecución.
+
+Las migraciones son archivos `sql/migrations/NNN_descripcion.sql` que se
+aplican en orden, cada uno en su propia transacción, y quedan registradas en
+`schema_migrations`. init.sql sigue siendo la base para una BD nueva; las
+migraciones llevan cualquier base (nueva o vieja) al esquema actual.
+
+    uv run python -m app.migrate            # aplica las pendientes
+    uv run python -m app.migrate status     # muestra qué falta
+    uv run python -m app.migrate check      # EXPLAIN de las consultas de la app
+
+`check` corre EXPLAIN con `enable_seqscan = off`: si aun así el plan tiene
+un Seq Scan sobre una tabla grande, no hay índice que sirva para esa
+consulta y el comando termina con error.
+"""
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+from sqlalchemy import text
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "sql" / "migrations"
+
+# Tablas que crecen con el historial: acá no se admiten lecturas secuenciales
+LARGE_TABLES = {"sessions", "matches", "match_participants", "player_session_stats"}
+
+SQL_CREATE_REGISTRY = text("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(200) NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+""")
+
+
+def available_migrations():
+    """Lista (versión, nombre, ruta) de los archivos de migración, ordenada."""
+    found = []
+    for path in MIGRATIONS_DIR.glob("*.sql"):
+        match = re.match(r"(\d+)_(.+)\.sql$", path.name)
+        if match:
+            found.append((int(match.group(1)), match.group(2), path))
+    return sorted(found)
+
+
+def split_statements(sql):
+    """Separa un script en sentencias, respetando comillas, $$ y comentarios.
+
+    Hace falta porque pg8000 no acepta varias sentencias en un mismo execute.
+    """
+    statements, current = [], []
+    i, n = 0, len(sql)
+    dollar_tag = None
+    while i < n:
+        ch = sql[i]
+        if dollar_tag:
+            if sql.startswith(dollar_tag, i):
+                current.append(dollar_tag)
+                i += len(dollar_tag)
+                dollar_tag = None
+                continue
+        elif sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        elif ch == "'":
+            end = i + 1
+            while end < n:
+                if sql[end] == "'" and sql[end + 1:end + 2] != "'":
+                    break
+                end += 2 if sql[end] == "'" else 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+            continue
+        elif ch == "$":
+            tag = re.match(r"\$[A-Za-z_]*\$", sql[i:])
+            if tag:
+                dollar_tag = tag.group(0)
+                current.append(dollar_tag)
+                i += len(dollar_tag)
+                continue
+        elif ch == ";":
+            statement = "".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            i += 1
+            continue
+        current.append(ch)
+        i += 1
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def applied_versions(conn):
+    conn.execute(SQL_CREATE_REGISTRY)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def migrate(engine, log=print):
+    """Aplica las migraciones pendientes en orden. Devuelve las versiones aplicadas."""
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+
+    applied = []
+    for version, name, path in available_migrations():
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            for statement in split_statements(path.read_text(encoding="utf-8")):
+                conn.exec_driver_sql(statement)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+                {"v": version, "n": name},
+            )
+        log(f"  ✔ {version:03d}_{name}")
+        applied.append(version)
+    return applied
+
+
+# --- CHEQUEO DE PLANES ---
+
+def checked_queries():
+    """Consultas de la app a verificar, con parámetros de ejemplo.
+
+    Al agregar una consulta nueva sobre las tablas grandes, sumarla acá.
+    """
+    from app import data, game_stats, history, matches, rivalries, stats
+
+    page_sql = history.SQL_PAGE
+    g = {"group_id": 1}
+    queries = [
+        ("Salón de la Fama", stats.SQL_LEADERBOARD, g),
+        ("Listas de los formularios", data.SQL_FORM_LOOKUP, {**g, "limit": 10}),
+        ("Partidas de la juntada", matches.SQL_SESSION_RECENT, {**g, "s": 1, "limit": 5}),
+        ("Ranking de temporada", stats.SQL_PERIOD_LEADERBOARD, {**g, "date_from": "2024-01-01", "date_to": "2025-01-01"}),
+        ("Meses con juntadas", stats.SQL_MONTHS, g),
+        ("Últimas N juntadas", stats.SQL_LAST_SESSIONS_FROM, {**g, "n": 5}),
+        ("Racha y forma", stats.SQL_RECENT_FORM, {**g, "n": stats.STREAK_LOOKBACK}),
+        ("Análisis por juego", game_stats.SQL_GAME_REPORT, {"games": [1]}),
+        ("Rivalidades (pendientes)", rivalries.SQL_PENDING, {**g, "seen": "1000000:1000000:"}),
+        ("Rivalidades (partidas nuevas)", rivalries.SQL_DELTA, {**g, "seen": "1000000:1000000:"}),
+    ]
+    filtros = {
+        "sin filtros": {},
+        "por fecha": {"date_from": "2024-01-01", "date_to": "2024-12-31"},
+        "por juego": {"game_id": 1},
+        "por ganador": {"winner_id": 1},
+        "por tipo": {"win_type": "Paliza"},
+    }
+    for label, kwargs in filtros.items():
+        clauses, params = history.build_filters(**kwargs)
+        clauses[:0] = ["m.group_id = :group_id"]
+        clauses.append("m.match_id < :before")
+        params.update(g, before=1_000_000, limit=history.PAGE_SIZE + 1)
+        sql = page_sql.format(where="WHERE " + " AND ".join(clauses))
+        queries.append((f"Historial ({label})", sql, params))
+    return queries
+
+
+def _seq_scans(plan):
+    """Devuelve las tablas grandes que el plan lee con Seq Scan."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in LARGE_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def check(engine, log=print):
+    """Corre EXPLAIN sobre cada consulta de la app. Devuelve True si ninguna cae en Seq Scan."""
+    ok = True
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SET enable_seqscan = off")
+        for label, sql, params in checked_queries():
+            raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar_one()
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+            scans = _seq_scans(plan)
+            if scans:
+                ok = False
+                log(f"  ✘ {label}: Seq Scan sobre {', '.join(sorted(set(scans)))}")
+            else:
+                log(f"  ✔ {label}")
+        conn.rollback()
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones del esquema")
+    parser.add_argument("command", nargs="?", default="up", choices=["up", "status", "check"])
+    args = parser.parse_args(argv)
+
+    from app.database import get_engine
+
+    engine = get_engine()
+    if args.command == "up":
+        applied = migrate(engine)
+        print(f"{len(applied)} migraciones aplicadas." if applied else "El esquema ya está al día.")
+    elif args.command == "status":
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+        for version, name, _ in available_migrations():
+            print(f"  {'✔' if version in done else '·'} {version:03d}_{name}")
+    else:
+        if not check(engine):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,8 @@ from sqlalchemy import text
 import os
 import time
 from dotenv import load_dotenv
-from app.database import get_engine
+from app.database import get_engine, pool_stats
+from app import awards, data, export, groups, importer, table_browser, telemetry
 
 load_dotenv()
 
@@ -45,22 +46,23 @@ st.toast("Bienvenido.", icon="🔓")
 
 # --- INICIO DEL PANEL DE DATOS ---
 engine = get_engine()
-tab_caballeros, tab_juegos, tab_db = st.tabs(["🎩 Gestión de Caballeros", "🃏 Carga de Juegos", "🗄️ Base de Datos"])
+tab_caballeros, tab_juegos, tab_import, tab_grupos, tab_db, tab_perf = st.tabs(["🎩 Gestión de Caballeros", "🃏 Carga de Juegos", "📥 Importar Historial", "🏰 Cofradías", "🗄️ Base de Datos", "⏱️ Rendimiento"])
 
-# Cargar datos auxiliares
+# Cargar datos auxiliares (de la cofradía elegida en la barra lateral)
+telemetry.set_origin("admin")
 try:
-    with engine.connect() as conn:
-        df_players = pd.read_sql("SELECT player_id, nickname FROM players WHERE active = TRUE", conn)
-        df_games = pd.read_sql("SELECT game_id, name FROM games", conn)
+    group_id, group_name = groups.current_group()
+    lookup = data.form_lookup(group_id, 10)
 except Exception as e:
     st.error(f"Error de conexión: {e}")
     st.stop()
 
-player_map = dict(zip(df_players['nickname'], df_players['player_id']))
-game_map = dict(zip(df_games['name'], df_games['game_id']))
+player_map = lookup.player_ids
+game_map = lookup.game_ids
 
 # PESTAÑA 1: GESTIÓN DE CABALLEROS
 with tab_caballeros:
+    telemetry.set_origin("admin:caballeros")
     st.header("🎩 Gestión de Caballeros")
 
     with st.form("new_player_form", clear_on_submit=True):
@@ -74,7 +76,7 @@ with tab_caballeros:
         new_birth = col1.date_input("Fecha de Nacimiento", min_value=pd.to_datetime("1970-01-01"), format="DD/MM/YYYY")
         
         # Controlamos que la lista no esté vacía para evitar errores
-        opciones_juegos = df_games['name'].tolist() if not df_games.empty else ["Sin juegos cargados"]
+        opciones_juegos = list(lookup.game_names) or ["Sin juegos cargados"]
         new_favgame = col2.selectbox("Juego Favorito", options=opciones_juegos)
 
         new_ownedgames = col1.number_input("Número de Juegos Propios", min_value=0, step=1)
@@ -83,16 +85,17 @@ with tab_caballeros:
         submitted = st.form_submit_button("Ingresar Caballero a la Mesa 🎲")
 
         if submitted:
-            if new_name and new_nick and not df_games.empty:
+            if new_name and new_nick and lookup.game_names:
                 try:
                     favgame_id = game_map[new_favgame]
                     with engine.connect() as conn:
                         query = text("""
-                            INSERT INTO players (name, nickname, birth_date, favgame_id, owned_games, role, active, created_at) 
-                            VALUES (:n, :nick, :b, :f, :o, :r, TRUE, NOW())
+                            INSERT INTO players (name, nickname, birth_date, favgame_id, owned_games, role, active, created_at, group_id) 
+                            VALUES (:n, :nick, :b, :f, :o, :r, TRUE, NOW(), :grp)
                         """)
 
                         conn.execute(query, {
+                            "grp": group_id,
                             "n": new_name, 
                             "nick": new_nick,
                             "b": new_birth,
@@ -101,6 +104,7 @@ with tab_caballeros:
                             "r": new_role
                         })
                         conn.commit()
+                    data.invalidate("players", group_id=group_id)
                     st.success(f"Bienvenido mi estimado {new_nick}, es todo un honor.")
                     time.sleep(1.5)
                     st.rerun()
@@ -114,20 +118,12 @@ with tab_caballeros:
     st.divider()
     st.subheader("Lista de Jugadores Activos")
 
-    with engine.connect() as conn:
-        # Actualizamos el SELECT para ver también los datos nuevos
-        df_players_view = pd.read_sql("""
-            SELECT p.nickname AS nombre, p.role, g.name AS favorite_game, p.owned_games, p.birth_date
-            FROM players p
-            LEFT JOIN games g ON p.favgame_id = g.game_id
-            WHERE p.active = TRUE                      
-            ORDER BY p.created_at DESC
-        """, conn)
-
-        st.dataframe(df_players_view, hide_index=True, use_container_width=True)
+    df_players_view = data.players_view(group_id)
+    st.dataframe(df_players_view, hide_index=True, use_container_width=True)
 
 # PESTAÑA 2: CARGA DE JUEGOS
 with tab_juegos:
+    telemetry.set_origin("admin:juegos")
     st.header("🃏 Carga de Nuevos Juegos")
 
     with st.form("new_game_form", clear_on_submit=True):
@@ -141,21 +137,22 @@ with tab_juegos:
 
         new_type = col1.selectbox("Tipo de Juego", ["Principal", "Casual", "Party Game", "co-op", "Cartas", "CATAN"])
         
-        opciones_owners = df_players['nickname'].tolist() if not df_players.empty else ["Sin jugadores"]
+        opciones_owners = list(lookup.player_names) or ["Sin jugadores"]
         new_owner = col2.selectbox("Dueño del Juego", options=opciones_owners)
 
         submitted_game = st.form_submit_button("Agregar Juego a la Ludoteca 📚")
 
         if submitted_game:
-            if new_game_name and new_game_maxplayers >= new_game_minplayers and not df_players.empty:
+            if new_game_name and new_game_maxplayers >= new_game_minplayers and lookup.player_names:
                 try:
                     owner_id = player_map[new_owner]
                     with engine.connect() as conn:
                         query = text("""
-                            INSERT INTO games (name, logo, min_players, max_players, type, owner_id) 
-                            VALUES (:n, :l, :minp, :maxp, :t, :o)
+                            INSERT INTO games (name, logo, min_players, max_players, type, owner_id, group_id) 
+                            VALUES (:n, :l, :minp, :maxp, :t, :o, :grp)
                         """)
                         conn.execute(query, {
+                            "grp": group_id,
                             "n": new_game_name,
                             "l": new_logo,
                             "minp": new_game_minplayers,
@@ -164,12 +161,13 @@ with tab_juegos:
                             "o": owner_id
                         })
                         conn.commit()
+                    data.invalidate("games", group_id=group_id)
                     st.success(f"'{new_game_name}' agregado exitosamente a la ludoteca.")
                     time.sleep(1)
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error al agregar juego: {e}")
-            elif df_players.empty:
+            elif not lookup.player_names:
                 st.warning("⚠️ Primero carga jugadores.")
             else:
                 st.warning("Por favor, revisa los nombres y la cantidad de jugadores.")
@@ -177,23 +175,208 @@ with tab_juegos:
     # --- VER JUEGOS ACTUALES ---
     st.divider()
     st.subheader("Lista de Juegos en la Ludoteca")
-    with engine.connect() as conn:
-        df_games_view = pd.read_sql("""
-            SELECT g.logo, g.name, g.type, g.min_players, g.max_players, p.nickname AS owner 
-            FROM games g
-            LEFT JOIN players p ON g.owner_id = p.player_id
-            ORDER BY g.name ASC
-        """, conn)
+    df_games_view = data.games_view(group_id)
+    st.dataframe(df_games_view, hide_index=True, use_container_width=True)
+
+# PESTAÑA 3: IMPORTACIÓN MASIVA
+with tab_import:
+    telemetry.set_origin("admin:importar")
+    st.header("📥 Importar Noches Históricas")
+    st.caption(f"Un archivo CSV o JSONL con una partida por fila, para la cofradía **{group_name}**. Las sesiones se crean por fecha y las filas inválidas se informan sin frenar la carga.")
+    st.code("date,host,game,winner,participants,win_type,duration_minutes\n2024-05-17,Juan,Catan,Pepe,Pepe;Juan;Tito,Normal,90", language="csv")
+
+    uploaded = st.file_uploader("Archivo de partidas", type=["csv", "jsonl", "ndjson"])
+    chunk_size = st.number_input("Partidas por bloque", min_value=100, max_value=20000, value=importer.CHUNK_SIZE, step=100)
+
+    if uploaded and st.button("Importar 🚚"):
+        progress = st.empty()
+
+        def mostrar_avance(imp):
+            progress.info(f"⏳ {imp.imported} partidas importadas, {len(imp.rejects)} rechazos...")
+
+        try:
+            result = importer.import_file(
+                engine,
+                importer.open_upload(uploaded),
+                importer.detect_format(uploaded.name),
+                chunk_size=int(chunk_size),
+                on_chunk=mostrar_avance,
+                group_id=group_id,
+            )
+        except Exception as e:
+            st.error(f"Error al importar: {e}")
+        else:
+            data.invalidate("players", "sessions", "matches", group_id=group_id)
+            data.invalidate("game_stats")
+            progress.success(f"✅ {result.imported} partidas importadas.")
+            st.info("Si importaste noches anteriores a las ya cargadas, recalculá los premios abajo.")
+            if result.rejects:
+                st.warning(f"{len(result.rejects)} filas rechazadas:")
+                st.dataframe(pd.DataFrame(result.rejects, columns=["Línea", "Motivo"]), hide_index=True, use_container_width=True)
 
-        st.dataframe(df_games_view, hide_index=True, use_container_width=True)
+    st.divider()
+    st.subheader("🏆 Recalcular La Meta de los 5")
+    st.caption("Reprocesa todo el historial en orden cronológico y reconstruye contadores, premios y tributos (se pierden las marcas de pagado).")
+    if st.button("Recalcular premios 🔁"):
+        try:
+            with engine.begin() as conn:
+                total = awards.replay(conn)
+            # El replay reescribe los premios de todas las cofradías
+            data.invalidate("awards")
+            st.success(f"Listo: {total} premios otorgados.")
+        except Exception as e:
+            st.error(f"Error recalculando premios: {e}")
+
+# PESTAÑA 4: COFRADÍAS
+with tab_grupos:
+    telemetry.set_origin("admin:cofradias")
+    st.header("🏰 Cofradías")
+    st.caption(
+        "Cada cofradía tiene sus propios caballeros, juegos, juntadas y rankings. "
+        "El link de cada una es la app con `?cofradia=<link>`."
+    )
+    # Sin cache: cuenta filas de todas las cofradías y las escrituras solo
+    # invalidan los tags de la suya (tabla@cofradía)
+    with engine.connect() as conn:
+        df_group_summary = pd.read_sql_query(text(groups.SQL_GROUP_SUMMARY), conn)
+    st.dataframe(df_group_summary, hide_index=True, use_container_width=True)
+
+    col_g1, col_g2 = st.columns(2)
+    with col_g1:
+        with st.form("new_group_form", clear_on_submit=True):
+            st.subheader("Nueva cofradía")
+            new_group_name = st.text_input("Nombre")
+            new_group_slug = st.text_input("Link (opcional)", placeholder="se arma a partir del nombre")
+            if st.form_submit_button("Fundar Cofradía 🏰"):
+                if not new_group_name.strip():
+                    st.warning("El nombre es obligatorio.")
+                else:
+                    try:
+                        with engine.begin() as conn:
+                            groups.create_group(conn, new_group_name.strip(), groups.slugify(new_group_slug) or None)
+                        st.success(f"Cofradía '{new_group_name}' fundada. Elegila en la barra lateral para cargarle caballeros y juegos.")
+                    except Exception as e:
+                        st.error(f"Error al crear la cofradía: {e}")
+    with col_g2:
+        with st.form("rename_group_form"):
+            st.subheader("Renombrar la actual")
+            renamed = st.text_input("Nombre", value=group_name)
+            if st.form_submit_button("Guardar ✏️") and renamed.strip() and renamed != group_name:
+                try:
+                    with engine.begin() as conn:
+                        groups.rename_group(conn, group_id, renamed.strip())
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error al renombrar: {e}")
 
-# PESTAÑA 3: DB (Solo lectura)
+# PESTAÑA 5: DB (Solo lectura)
 with tab_db:
+    telemetry.set_origin("admin:db")
     st.header("🗄️ Estado de la Base de Datos")
-    col_db1, col_db2 = st.columns(2)
-    with col_db1:
-            st.subheader("Players (Raw)")
-            st.dataframe(df_players, use_container_width=True)
-    with col_db2:
-            st.subheader("Games (Raw)")
-            st.dataframe(df_games, use_container_width=True)
+
+    st.subheader("🔎 Tablas (Raw)")
+    raw_table = st.selectbox("Tabla", list(table_browser.TABLES), key="db_tabla")
+    with engine.connect() as conn:
+        raw_types = table_browser.columns(conn, raw_table)
+        raw_estimate = table_browser.estimated_rows(conn, raw_table)
+    st.caption(
+        f"≈ {raw_estimate:,} filas (estimación de Postgres)" if raw_estimate is not None
+        else "Sin estadísticas todavía (la tabla nunca se analizó)."
+    )
+    raw_cols = st.multiselect("Columnas", list(raw_types), default=list(raw_types), key=f"db_cols_{raw_table}")
+    col_f1, col_f2, col_f3 = st.columns([.4, .25, .35])
+    filtro_col = col_f1.selectbox("Filtrar por", ["(sin filtro)", *raw_types], key=f"db_fcol_{raw_table}")
+    filtro_op = col_f2.selectbox("Condición", table_browser.OPERATORS, key=f"db_fop_{raw_table}")
+    filtro_valor = col_f3.text_input("Valor", key=f"db_fval_{raw_table}")
+    raw_filters = []
+    if filtro_col != "(sin filtro)" and (filtro_valor or filtro_op in ("es nulo", "no es nulo")):
+        raw_filters.append((filtro_col, filtro_op, filtro_valor))
+
+    # Pila de claves: cada página arranca después de la última fila de la anterior.
+    # Si cambia la tabla o el filtro, se vuelve a la primera página.
+    consulta = (raw_table, tuple(raw_filters))
+    if st.session_state.get("db_consulta") != consulta:
+        st.session_state.db_consulta = consulta
+        st.session_state.db_paginas = [None]
+    paginas = st.session_state.db_paginas
+
+    try:
+        with engine.connect() as conn:
+            df_raw, next_key = table_browser.fetch_page(conn, raw_table, raw_cols, raw_filters, after=paginas[-1])
+    except Exception as e:
+        st.error(f"No se pudo leer la tabla: {e}")
+    else:
+        st.dataframe(df_raw, hide_index=True, use_container_width=True)
+        col_n1, col_n2, col_n3 = st.columns([.3, .4, .3])
+        if col_n1.button("⬅️ Anterior", disabled=len(paginas) == 1):
+            paginas.pop()
+            st.rerun()
+        col_n2.caption(f"Página {len(paginas)} · {len(df_raw)} filas")
+        if col_n3.button("Siguiente ➡️", disabled=next_key is None):
+            paginas.append(next_key)
+            st.rerun()
+
+    st.subheader("🔌 Pool de Conexiones")
+    pool = pool_stats(engine)
+    col_p1, col_p2, col_p3, col_p4 = st.columns(4)
+    col_p1.metric("Driver", pool["driver"])
+    col_p2.metric("En uso", pool["checked_out"])
+    col_p3.metric("Libres", pool["checked_in"])
+    col_p4.metric("Overflow", pool["overflow"])
+    st.caption(pool["status"])
+
+    st.subheader("📦 Snapshot para Analistas")
+    st.caption(
+        f"Exporta las tablas a Parquet en `{export.SNAPSHOT_DIR}` para analizar sin cargar la base. "
+        "Incremental: solo agrega las partidas y juntadas nuevas."
+    )
+    export_full = st.checkbox("Exportar todo de nuevo (borra el snapshot anterior)")
+    if st.button("📦 Exportar snapshot"):
+        try:
+            with st.spinner("Exportando..."):
+                exported = export.export(engine, full=export_full, log=lambda _: None)
+            st.success(f"Snapshot actualizado: {sum(exported.values())} filas.")
+        except Exception as e:
+            st.error(f"Error al exportar: {e}")
+    runs = export.read_manifest()["runs"]
+    if runs:
+        st.dataframe(
+            pd.DataFrame([{"Fecha": r["at"], "Completo": r["full"], **r["rows"]} for r in reversed(runs)]),
+            hide_index=True, use_container_width=True,
+        )
+
+# PESTAÑA 6: RENDIMIENTO (consultas medidas en este proceso)
+with tab_perf:
+    st.header("⏱️ Rendimiento de Consultas")
+    st.caption(
+        f"Últimas {telemetry.QUERY_LOG_SIZE} sentencias ejecutadas por este servidor. "
+        f"Lentas: más de {telemetry.SLOW_QUERY_MS:.0f} ms (variable SLOW_QUERY_MS)."
+    )
+
+    df_summary = telemetry.summary()
+    if df_summary.empty:
+        st.info("Todavía no se midió ninguna consulta.")
+    else:
+        st.subheader("Top por tiempo total")
+        st.dataframe(df_summary.head(15), hide_index=True, use_container_width=True)
+
+        st.subheader("Top por p95")
+        st.dataframe(df_summary.sort_values("p95_ms", ascending=False).head(15), hide_index=True, use_container_width=True)
+
+    st.subheader("🐢 Consultas lentas")
+    df_slow = telemetry.slow_queries()
+    if df_slow.empty:
+        st.success("Ninguna consulta superó el umbral.")
+    else:
+        st.dataframe(df_slow, hide_index=True, use_container_width=True)
+
+    col_e1, col_e2 = st.columns(2)
+    col_e1.download_button(
+        "📤 Exportar (Prometheus)",
+        data=telemetry.prometheus_text(),
+        file_name="queries.prom",
+        mime="text/plain",
+    )
+    if col_e2.button("🧹 Vaciar mediciones"):
+        telemetry.clear()
+        st.rerun()
@@ -0,0 +1,159 @@
+"""Rating estilo Elo para partidas de varios jugadores, vectorizado con NumPy.
+
+En cada partida el ganador "le gana" a cada uno de los demás: por cada par
+se calcula la probabilidad esperada de Elo y se transfiere
+K * (1 - esperado) / (jugadores - 1) puntos del perdedor al ganador. Así el
+tamaño de la mesa y la fuerza de los rivales pesan en el resultado.
+
+Las partidas se procesan en orden cronológico y por juntada: todas las
+partidas de una misma sesión se evalúan con los ratings del comienzo de la
+noche (como un "período de rating" de Glicko) y se aplican juntas con
+np.bincount. Eso deja un solo loop de Python por sesión, no por partida.
+
+El modo incremental procesa solo las partidas que no se veían en la foto
+de la base guardada en el checkpoint (matches.unseen), así que no saltea
+una partida que se confirmó tarde con un match_id menor. Las partidas
+viejas que llegan tarde (por ejemplo, importadas) se suman después de las
+nuevas; para que cuenten en orden cronológico conviene un replay:
+
+    uv run python -m app.ratings update     # incremental
+    uv run python -m app.ratings rebuild    # replay completo
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from app import matches
+
+BASE_RATING = 1500.0
+K_FACTOR = 32.0
+
+# La foto sale en la misma sentencia que las filas: es exactamente la que vio
+# la lectura (en una fila vacía si no hay nada nuevo)
+SQL_HISTORY = text(f"""
+    WITH snap AS (SELECT CAST(pg_current_snapshot() AS TEXT) AS snapshot)
+    SELECT snap.snapshot, h.match_id, h.player_id, h.rank, h.session_key
+    FROM snap
+    LEFT JOIN (
+        SELECT
+            mp.match_id,
+            mp.player_id,
+            mp.rank,
+            COALESCE(m.session_id, -m.match_id) AS session_key,
+            s.date
+        FROM match_participants mp
+        JOIN matches m ON m.match_id = mp.match_id
+        LEFT JOIN sessions s ON s.session_id = m.session_id
+        WHERE {matches.unseen("m.recorded_xid")}
+    ) h ON TRUE
+    ORDER BY h.date NULLS FIRST, h.session_key, h.match_id
+""")
+
+SQL_SAVE = text("""
+    INSERT INTO player_ratings AS pr (player_id, rating, matches_rated, updated_at)
+    SELECT t.player_id, t.rating, t.played, NOW()
+    FROM unnest(
+        CAST(:ids AS INTEGER[]), CAST(:ratings AS DOUBLE PRECISION[]), CAST(:played AS INTEGER[])
+    ) AS t(player_id, rating, played)
+    ON CONFLICT (player_id) DO UPDATE SET
+        rating = EXCLUDED.rating,
+        matches_rated = pr.matches_rated + EXCLUDED.matches_rated,
+        updated_at = NOW()
+""")
+
+
+def replay(df, initial=None, k_factor=K_FACTOR):
+    """Procesa participaciones en orden y devuelve (player_ids, ratings, partidas jugadas).
+
+    `df` trae match_id, player_id, rank y batch (entero creciente por
+    juntada), ordenado cronológicamente. `initial` es {player_id: rating}
+    para seguir desde un checkpoint.
+    """
+    initial = initial or {}
+    known = np.fromiter(initial.keys(), dtype=np.int64, count=len(initial))
+    ids = np.union1d(known, df["player_id"].to_numpy(dtype=np.int64))
+    ratings = np.full(len(ids), BASE_RATING)
+    if initial:
+        ratings[np.searchsorted(ids, known)] = np.fromiter(initial.values(), dtype=np.float64, count=len(initial))
+    if df.empty:
+        return ids, ratings, np.zeros(len(ids), dtype=np.int64)
+
+    n_players = len(ids)
+    player = np.searchsorted(ids, df["player_id"].to_numpy(dtype=np.int64))
+    match, _ = pd.factorize(df["match_id"], sort=False)
+    size = np.bincount(match)
+    is_winner = df["rank"].to_numpy() == 1
+
+    winner_of = np.full(len(size), -1)
+    winner_of[match[is_winner]] = player[is_winner]
+
+    # Una fila por perdedor: contra quién perdió, cuánto pesa y en qué juntada
+    loser = ~is_winner & (winner_of[match] >= 0) & (size[match] > 1)
+    l_player = player[loser]
+    l_winner = winner_of[match[loser]]
+    l_weight = k_factor / (size[match[loser]] - 1)
+    l_batch = df["batch"].to_numpy()[loser]
+
+    cuts = np.flatnonzero(np.diff(l_batch)) + 1
+    for a, b in zip(np.r_[0, cuts], np.r_[cuts, len(l_batch)]):
+        if a == b:
+            continue
+        lp, w = l_player[a:b], l_winner[a:b]
+        expected = 1.0 / (1.0 + 10.0 ** ((ratings[lp] - ratings[w]) / 400.0))
+        delta = l_weight[a:b] * (1.0 - expected)
+        ratings += np.bincount(w, weights=delta, minlength=n_players)
+        ratings -= np.bincount(lp, weights=delta, minlength=n_players)
+
+    return ids, ratings, np.bincount(player, minlength=n_players)
+
+
+def update(engine, full=False):
+    """Actualiza player_ratings desde el checkpoint (o desde cero con `full`).
+
+    Devuelve la cantidad de participaciones procesadas.
+    """
+    with engine.begin() as conn:
+        # FOR UPDATE: si dos procesos corren a la vez, el segundo espera y no duplica
+        seen = conn.execute(text("SELECT snapshot FROM rating_checkpoint WHERE id = 1 FOR UPDATE")).scalar_one()
+        if full:
+            conn.execute(text("TRUNCATE player_ratings"))
+            seen = matches.SNAPSHOT_EMPTY
+
+        df = pd.read_sql_query(SQL_HISTORY, conn, params={"seen": seen})
+        snapshot = df["snapshot"].iloc[0]
+        df = df.dropna(subset=["match_id"]).drop(columns="snapshot")
+        if not df.empty:
+            df = df.astype({"match_id": "int64", "player_id": "int64", "rank": "int64", "session_key": "int64"})
+            df["batch"] = (df["session_key"] != df["session_key"].shift()).cumsum()
+
+            initial = dict(conn.execute(text("SELECT player_id, rating FROM player_ratings")).all())
+            ids, ratings, played = replay(df, initial)
+
+            touched = played > 0
+            conn.execute(SQL_SAVE, {
+                "ids": ids[touched].tolist(),
+                "ratings": ratings[touched].tolist(),
+                "played": played[touched].tolist(),
+            })
+        conn.execute(
+            text("UPDATE rating_checkpoint SET snapshot = :s, updated_at = NOW() WHERE id = 1"),
+            {"s": snapshot},
+        )
+    return len(df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rating Elo de los caballeros")
+    parser.add_argument("command", choices=["update", "rebuild"])
+    args = parser.parse_args(argv)
+
+    from app.database import get_engine
+
+    processed = update(get_engine(), full=args.command == "rebuild")
+    print(f"Ratings actualizados: {processed} participaciones procesadas.")
+
+
+if __name__ == "__main__":
+    main()
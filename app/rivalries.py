@@ -0,0 +1,158 @@
+"""Matriz de rivalidades: partidas compartidas y victorias entre cada par.
+
+Se arma sin self-join sobre match_participants. Con las participaciones
+ordenadas por partida, las mesas del mismo tamaño k se apilan en una matriz
+(partidas × k) y todos los pares salen por broadcasting y np.bincount. Es
+el producto Bᵀ·B de la matriz de incidencia partida × jugador sin
+materializarla: el costo es k² por partida (k chico), lineal en la
+cantidad de participaciones.
+
+Hay una matriz por cofradía (nunca comparten mesa), en memoria del proceso,
+y se pone al día de forma incremental: guarda la foto de la base con la que
+leyó por última vez y suma las partidas que en esa foto todavía no estaban
+confirmadas (ver matches.unseen), aunque tengan un match_id menor que otras
+ya sumadas. Para saber si hay algo nuevo se cuentan esas partidas, por el
+cache de data con el tag "matches": mientras nadie guarde partidas no hay
+consultas. Si se editan o borran partidas a mano, reset() la vuelve a armar
+desde cero.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+
+from app import data, matches
+from app.database import get_engine
+
+SQL_PENDING = f"""
+    SELECT COUNT(*) AS pending
+    FROM matches m
+    WHERE m.group_id = :group_id AND {matches.unseen("m.recorded_xid")}
+"""
+
+SQL_DELTA = f"""
+    SELECT mp.match_id, mp.player_id, mp.rank
+    FROM matches m
+    JOIN match_participants mp ON mp.match_id = m.match_id
+    WHERE m.group_id = :group_id AND {matches.unseen("m.recorded_xid")}
+    ORDER BY mp.match_id
+"""
+
+
+def pair_counts(match, player, is_winner, n_players):
+    """Cuenta pares dentro de cada mesa. Devuelve (shared, wins) de n × n.
+
+    `match` son códigos 0..M-1 en orden (las filas de una partida juntas),
+    `player` el índice de cada jugador y `is_winner` si ganó esa partida.
+    shared[i, j] es cuántas partidas jugaron juntos i y j; wins[i, j]
+    cuántas de ésas ganó i. La diagonal de shared queda con las partidas
+    jugadas por cada uno.
+    """
+    cells = n_players * n_players
+    shared = np.zeros(cells, dtype=np.int64)
+    wins = np.zeros(cells, dtype=np.int64)
+    size = np.bincount(match)
+    starts = np.r_[0, np.cumsum(size)[:-1]]
+    for k in np.unique(size):
+        rows = starts[size == k][:, None] + np.arange(k)  # (partidas, k)
+        tables = player[rows]
+        pairs = (tables[:, :, None] * n_players + tables[:, None, :]).ravel()
+        shared += np.bincount(pairs, minlength=cells)
+        won = np.broadcast_to(is_winner[rows][:, :, None], (len(rows), k, k)).ravel()
+        wins += np.bincount(pairs[won], minlength=cells)
+    return shared.reshape(n_players, n_players), wins.reshape(n_players, n_players)
+
+
+class RivalryMatrix:
+    """Matrices de pares de una cofradía, con la foto de la base hasta donde llegan."""
+
+    def __init__(self, group_id):
+        self.group_id = group_id
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.ids = np.empty(0, dtype=np.int64)
+            self.shared = np.zeros((0, 0), dtype=np.int64)
+            self.wins = np.zeros((0, 0), dtype=np.int64)
+            self.seen = matches.SNAPSHOT_EMPTY
+
+    def _grow(self, player_ids):
+        """Agrega filas/columnas para jugadores nuevos, conservando lo acumulado."""
+        ids = np.union1d(self.ids, player_ids)
+        if len(ids) == len(self.ids):
+            return
+        keep = np.ix_(*[np.searchsorted(ids, self.ids)] * 2)
+        shared = np.zeros((len(ids), len(ids)), dtype=np.int64)
+        wins = np.zeros_like(shared)
+        shared[keep], wins[keep] = self.shared, self.wins
+        self.ids, self.shared, self.wins = ids, shared, wins
+
+    def apply(self, df):
+        """Suma participaciones nuevas (match_id, player_id, rank), ordenadas por partida."""
+        if df.empty:
+            return
+        self._grow(df["player_id"].to_numpy(dtype=np.int64))
+        match, _ = pd.factorize(df["match_id"], sort=False)
+        player = np.searchsorted(self.ids, df["player_id"].to_numpy(dtype=np.int64))
+        shared, wins = pair_counts(match, player, df["rank"].to_numpy() == 1, len(self.ids))
+        self.shared += shared
+        self.wins += wins
+
+    def update(self):
+        """Suma las partidas confirmadas desde la última lectura, si las hay."""
+        pending = int(data.cached_read(
+            SQL_PENDING, tags=["matches"], params={"group_id": self.group_id, "seen": self.seen}
+        )["pending"].iloc[0])
+        if not pending:
+            return
+        with self._lock:
+            with get_engine().connect() as conn:
+                # Foto y lectura en la misma transacción: lo que se lee es exactamente lo que la foto ve
+                conn = conn.execution_options(isolation_level="REPEATABLE READ")
+                with conn.begin():
+                    snapshot = conn.execute(text(matches.SQL_SNAPSHOT)).scalar_one()
+                    delta = pd.read_sql_query(
+                        text(SQL_DELTA), conn, params={"group_id": self.group_id, "seen": self.seen}
+                    )
+            self.apply(delta)
+            self.seen = snapshot
+
+    def frame(self, player_ids=None):
+        """Pares con al menos una partida compartida, en formato largo.
+
+        Columnas: player_id, rival_id, shared, wins, rival_wins. Con
+        `player_ids` se limita a esos jugadores (en ambos lados).
+        """
+        with self._lock:
+            idx = np.arange(len(self.ids))
+            if player_ids is not None:
+                idx = idx[np.isin(self.ids, list(player_ids))]
+            shared = self.shared[np.ix_(idx, idx)]
+            wins = self.wins[np.ix_(idx, idx)]
+            ids = self.ids[idx]
+        i, j = np.nonzero(shared)
+        off_diagonal = i != j
+        i, j = i[off_diagonal], j[off_diagonal]
+        return pd.DataFrame({
+            "player_id": ids[i],
+            "rival_id": ids[j],
+            "shared": shared[i, j],
+            "wins": wins[i, j],
+            "rival_wins": wins[j, i],
+        })
+
+    def played(self):
+        """Partidas jugadas por jugador (la diagonal), como Serie indexada por player_id."""
+        with self._lock:
+            return pd.Series(np.diag(self.shared), index=self.ids)
+
+
+@st.cache_resource
+def get_matrix(group_id):
+    """Una matriz por cofradía y por proceso, compartida entre sesiones."""
+    return RivalryMatrix(group_id)
+
@@ -0,0 +1,227 @@
+"""Resumen incremental de estadísticas por jugador (tabla player_stats).
+
+El Salón de la Fama lee de acá en lugar de agrupar toda match_participants
+en cada rerun. Para los rankings por período (temporada, mes, últimas N
+juntadas) hay además un resumen por jugador y juntada (player_session_stats):
+cualquier ventana es sumar unas pocas filas por jugador. Las dos tablas se
+actualizan dentro de la misma transacción que registra la partida, y se
+pueden reconstruir desde cero con:
+
+    uv run python -m app.stats rebuild
+"""
+import argparse
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import text
+
+# Partidas que se muestran en la "forma" y tope para contar la racha
+FORM_WINDOW = 5
+STREAK_LOOKBACK = 20
+
+# Cómo se acumula una fila nueva sobre el resumen existente (INSERT INTO player_stats AS ps)
+ON_CONFLICT_ACCUMULATE = """
+    ON CONFLICT (player_id) DO UPDATE SET
+        matches_played = ps.matches_played + EXCLUDED.matches_played,
+        wins = ps.wins + EXCLUDED.wins,
+        runner_ups = ps.runner_ups + EXCLUDED.runner_ups,
+        last_played = GREATEST(ps.last_played, EXCLUDED.last_played)
+"""
+
+# Lo mismo para el resumen por juntada (INSERT INTO player_session_stats AS pss)
+ON_CONFLICT_ACCUMULATE_SESSION = """
+    ON CONFLICT (player_id, session_id) DO UPDATE SET
+        matches_played = pss.matches_played + EXCLUDED.matches_played,
+        wins = pss.wins + EXCLUDED.wins,
+        runner_ups = pss.runner_ups + EXCLUDED.runner_ups
+"""
+
+# Suma un lote de partidas ya insertadas a los contadores de cada participante
+SQL_APPLY_MATCHES = text("""
+    INSERT INTO player_stats AS ps (player_id, matches_played, wins, runner_ups, last_played)
+    SELECT
+        mp.player_id,
+        COUNT(*),
+        SUM(CASE WHEN mp.rank = 1 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN mp.rank = 2 THEN 1 ELSE 0 END),
+        MAX(s.date)
+    FROM match_participants mp
+    JOIN matches m ON m.match_id = mp.match_id
+    LEFT JOIN sessions s ON s.session_id = m.session_id
+    WHERE mp.match_id = ANY(CAST(:ids AS INTEGER[]))
+    GROUP BY mp.player_id
+""" + ON_CONFLICT_ACCUMULATE)
+
+SQL_APPLY_MATCHES_SESSION = text("""
+    INSERT INTO player_session_stats AS pss (player_id, session_id, session_date, group_id, matches_played, wins, runner_ups)
+    SELECT
+        mp.player_id,
+        s.session_id,
+        s.date,
+        s.group_id,
+        COUNT(*),
+        SUM(CASE WHEN mp.rank = 1 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN mp.rank = 2 THEN 1 ELSE 0 END)
+    FROM match_participants mp
+    JOIN matches m ON m.match_id = mp.match_id
+    JOIN sessions s ON s.session_id = m.session_id
+    WHERE mp.match_id = ANY(CAST(:ids AS INTEGER[]))
+    GROUP BY mp.player_id, s.session_id, s.date, s.group_id
+""" + ON_CONFLICT_ACCUMULATE_SESSION)
+
+# Recalcula todo a partir de la tabla de hechos (solo para el comando rebuild)
+SQL_REBUILD = text("""
+    INSERT INTO player_stats (player_id, matches_played, wins, runner_ups, last_played)
+    SELECT
+        mp.player_id,
+        COUNT(*),
+        SUM(CASE WHEN mp.rank = 1 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN mp.rank = 2 THEN 1 ELSE 0 END),
+        MAX(s.date)
+    FROM match_participants mp
+    JOIN matches m ON m.match_id = mp.match_id
+    LEFT JOIN sessions s ON s.session_id = m.session_id
+    GROUP BY mp.player_id
+""")
+
+SQL_REBUILD_SESSION = text("""
+    INSERT INTO player_session_stats (player_id, session_id, session_date, group_id, matches_played, wins, runner_ups)
+    SELECT
+        mp.player_id,
+        s.session_id,
+        s.date,
+        s.group_id,
+        COUNT(*),
+        SUM(CASE WHEN mp.rank = 1 THEN 1 ELSE 0 END),
+        SUM(CASE WHEN mp.rank = 2 THEN 1 ELSE 0 END)
+    FROM match_participants mp
+    JOIN matches m ON m.match_id = mp.match_id
+    JOIN sessions s ON s.session_id = m.session_id
+    GROUP BY mp.player_id, s.session_id, s.date, s.group_id
+""")
+
+# Lectura O(jugadores de la cofradía) para el Salón de la Fama
+SQL_LEADERBOARD = """
+    SELECT
+        p.player_id,
+        p.nickname AS "Caballero",
+        ps.matches_played AS "Partidas Jugadas",
+        ps.wins AS "Victorias",
+        ps.runner_ups AS "Subcampeonatos",
+        ps.last_played AS "Última Partida",
+        ROUND(CAST(pr.rating AS NUMERIC), 0) AS "Rating"
+    FROM player_stats ps
+    JOIN players p ON p.player_id = ps.player_id
+    LEFT JOIN player_ratings pr ON pr.player_id = ps.player_id
+    WHERE p.group_id = :group_id AND ps.matches_played > 0
+    ORDER BY "Victorias" DESC, "Subcampeonatos" DESC
+"""
+
+# Ranking de un período: suma las filas de player_session_stats de la cofradía en [date_from, date_to)
+SQL_PERIOD_LEADERBOARD = """
+    SELECT
+        p.player_id,
+        p.nickname AS "Caballero",
+        SUM(b.matches_played) AS "Partidas Jugadas",
+        SUM(b.wins) AS "Victorias",
+        SUM(b.runner_ups) AS "Subcampeonatos",
+        MAX(b.session_date) AS "Última Partida",
+        ROUND(CAST(MAX(pr.rating) AS NUMERIC), 0) AS "Rating"
+    FROM player_session_stats b
+    JOIN players p ON p.player_id = b.player_id
+    LEFT JOIN player_ratings pr ON pr.player_id = b.player_id
+    WHERE b.group_id = :group_id AND b.session_date >= :date_from AND b.session_date < :date_to
+    GROUP BY p.player_id, p.nickname
+    HAVING SUM(b.matches_played) > 0
+    ORDER BY "Victorias" DESC, "Subcampeonatos" DESC
+"""
+
+# Meses con juntadas (para elegir temporada o mes)
+SQL_MONTHS = """
+    SELECT DISTINCT CAST(date_trunc('month', date) AS DATE) AS month
+    FROM sessions
+    WHERE group_id = :group_id
+    ORDER BY month DESC
+"""
+
+# Fecha de la más vieja entre las últimas :n juntadas
+SQL_LAST_SESSIONS_FROM = """
+    SELECT MIN(date) AS date_from
+    FROM (SELECT date FROM sessions WHERE group_id = :group_id ORDER BY date DESC LIMIT :n) t
+"""
+
+# Últimos ranks de cada jugador (el más nuevo primero), por el índice de participaciones por jugador
+SQL_RECENT_FORM = """
+    SELECT ps.player_id, f.ranks
+    FROM player_stats ps
+    JOIN players p ON p.player_id = ps.player_id
+    CROSS JOIN LATERAL (
+        SELECT array_agg(r.rank ORDER BY r.match_id DESC) AS ranks
+        FROM (
+            SELECT mp.rank, mp.match_id
+            FROM match_participants mp
+            WHERE mp.player_id = ps.player_id
+            ORDER BY mp.match_id DESC
+            LIMIT :n
+        ) r
+    ) f
+    WHERE p.group_id = :group_id AND ps.matches_played > 0
+"""
+
+
+def period_bounds(kind, value=None):
+    """Rango [desde, hasta) de un período: temporada (año), mes (fecha del 1°) o todo."""
+    if kind == "season":
+        return date(value, 1, 1), date(value + 1, 1, 1)
+    if kind == "month":
+        return value, date(value.year + value.month // 12, value.month % 12 + 1, 1)
+    return date.min, date.max
+
+
+def form_metrics(df):
+    """Racha de victorias en curso y forma reciente a partir de SQL_RECENT_FORM.
+
+    "Racha" son las victorias seguidas hasta la última partida (con tope
+    STREAK_LOOKBACK); "Forma" las últimas FORM_WINDOW, de la más vieja a
+    la más nueva.
+    """
+    won = df["ranks"].map(lambda ranks: [r == 1 for r in ranks or []])
+    return pd.DataFrame({
+        "player_id": df["player_id"],
+        "Racha": won.map(lambda w: next((i for i, x in enumerate(w) if not x), len(w))),
+        "Forma": won.map(lambda w: "".join("🟢" if x else "⚪" for x in reversed(w[:FORM_WINDOW]))),
+    })
+
+
+def apply_matches(conn, match_ids):
+    """Actualiza player_stats con partidas ya insertadas (por ejemplo, un lote importado).
+
+    Debe llamarse con la misma conexión (y transacción) que insertó las
+    partidas y sus participantes, así el resumen nunca queda desfasado.
+    """
+    conn.execute(SQL_APPLY_MATCHES, {"ids": list(match_ids)})
+    conn.execute(SQL_APPLY_MATCHES_SESSION, {"ids": list(match_ids)})
+
+
+def rebuild(conn):
+    """Vacía y reconstruye player_stats y player_session_stats desde match_participants."""
+    conn.execute(text("TRUNCATE player_stats, player_session_stats"))
+    conn.execute(SQL_REBUILD)
+    conn.execute(SQL_REBUILD_SESSION)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantenimiento de player_stats")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+
+    from app.database import get_engine
+
+    with get_engine().begin() as conn:
+        rebuild(conn)
+        total = conn.execute(text("SELECT COUNT(*) FROM player_stats")).scalar()
+    print(f"player_stats reconstruida: {total} jugadores.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Explorador de tablas crudas para el panel de administración.
+
+Pensado para las tablas grandes (matches, match_participants, sessions):
+
+* Cantidad de filas estimada desde pg_class.reltuples (la que mantiene
+  ANALYZE/autovacuum), en lugar de un COUNT(*) que recorre la tabla.
+* Solo se piden las columnas elegidas y los filtros van en el WHERE, con
+  parámetros; los nombres de columna se validan contra information_schema.
+* Cada página se lee con un cursor del servidor (stream_results) y se
+  traen solo sus filas; la siguiente arranca después de la última clave
+  (keyset), así que la memoria depende del tamaño de página, no de la tabla.
+"""
+import pandas as pd
+from sqlalchemy import text
+
+from app.export import SQL_COLUMNS
+
+# Tablas que se pueden explorar y su clave de orden (la primary key)
+TABLES = {
+    "matches": ("match_id",),
+    "match_participants": ("match_id", "player_id"),
+    "sessions": ("session_id",),
+    "players": ("player_id",),
+    "groups": ("group_id",),
+    "games": ("game_id",),
+}
+
+PAGE_SIZE = 200
+
+OPERATORS = ["=", "<>", ">", ">=", "<", "<=", "contiene", "es nulo", "no es nulo"]
+
+SQL_ESTIMATED_ROWS = text("SELECT CAST(reltuples AS BIGINT) FROM pg_class WHERE oid = CAST(:t AS regclass)")
+
+
+def columns(conn, table):
+    """{columna: tipo de Postgres}, en el orden de la tabla."""
+    return dict(conn.execute(SQL_COLUMNS, {"t": table}).all())
+
+
+def estimated_rows(conn, table):
+    """Filas según las estadísticas del planner; None si la tabla nunca se analizó."""
+    estimate = conn.execute(SQL_ESTIMATED_ROWS, {"t": table}).scalar()
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+def build_where(filters, types):
+    """Arma las condiciones a partir de [(columna, operador, valor)]. Devuelve (cláusulas, params).
+
+    Los nombres de columna se validan contra `types` ({columna: tipo}); el
+    valor viaja como parámetro y Postgres lo convierte al tipo de la columna.
+    """
+    clauses, params = [], {}
+    for i, (column, op, value) in enumerate(filters):
+        if column not in types:
+            raise ValueError(f"Columna desconocida: {column}")
+        if op == "es nulo":
+            clauses.append(f"{column} IS NULL")
+        elif op == "no es nulo":
+            clauses.append(f"{column} IS NOT NULL")
+        elif op == "contiene":
+            clauses.append(f"CAST({column} AS TEXT) ILIKE :f{i}")
+            params[f"f{i}"] = f"%{value}%"
+        elif op in OPERATORS:
+            clauses.append(f"{column} {op} CAST(:f{i} AS {types[column]})")
+            params[f"f{i}"] = str(value)
+        else:
+            raise ValueError(f"Operador desconocido: {op}")
+    return clauses, params
+
+
+def fetch_page(conn, table, selected=None, filters=(), after=None, page_size=PAGE_SIZE):
+    """Trae una página: (DataFrame, clave de su última fila o None si no hay más).
+
+    `after` es la clave (tupla) devuelta por la página anterior. El cursor
+    del servidor se cierra apenas se leen page_size + 1 filas (la de más
+    solo dice si hay otra página).
+    """
+    key = TABLES[table]
+    types = columns(conn, table)
+    selected = [c for c in (selected or types) if c in types]
+    clauses, params = build_where(filters, types)
+    if after is not None:
+        clauses.append(f"({', '.join(key)}) > ({', '.join(f':k{i}' for i in range(len(key)))})")
+        params.update({f"k{i}": v for i, v in enumerate(after)})
+
+    # La clave siempre viaja (hace falta para la página siguiente) aunque no se muestre
+    fetched = list(dict.fromkeys([*key, *selected]))
+    sql = f"SELECT {', '.join(fetched)} FROM {table}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {', '.join(key)} LIMIT {page_size + 1}"
+
+    result = conn.execution_options(stream_results=True, max_row_buffer=page_size + 1).execute(text(sql), params)
+    try:
+        rows = result.fetchmany(page_size + 1)
+    finally:
+        result.close()
+
+    # La clave va primero en `fetched`: se toma tal cual la devolvió el driver
+    next_key = tuple(rows[page_size - 1][:len(key)]) if len(rows) > page_size else None
+    df = pd.DataFrame.from_records(rows[:page_size], columns=fetched)
+    return df[selected], next_key
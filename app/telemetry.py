@@ -0,0 +1,131 @@
+"""Medición de cada sentencia SQL y log de consultas lentas.
+
+install() engancha eventos de SQLAlchemy en el engine: cada sentencia queda
+en un ring buffer en memoria (latencia, filas y desde qué página/pestaña se
+llamó). Las que superan SLOW_QUERY_MS además van al logger
+"app.slow_queries". El panel de administración (pestaña ⏱️ Rendimiento) lee
+de acá; también hay una exportación en formato de texto de Prometheus.
+
+Cada página marca su origen con set_origin("main:stats") al empezar a
+dibujar una pestaña.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+import pandas as pd
+from sqlalchemy import event
+
+QUERY_LOG_SIZE = int(os.getenv("QUERY_LOG_SIZE", "2000"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+
+slow_log = logging.getLogger("app.slow_queries")
+
+_origin = ContextVar("query_origin", default="(sin origen)")
+_records = deque(maxlen=QUERY_LOG_SIZE)
+_slow = deque(maxlen=200)
+_lock = threading.Lock()
+
+
+def set_origin(origin):
+    """Marca desde dónde salen las consultas siguientes de este hilo (página:pestaña)."""
+    _origin.set(origin)
+
+
+def _normalize(statement):
+    return re.sub(r"\s+", " ", statement).strip()
+
+
+def install(engine):
+    """Registra los eventos de medición en un engine (se llama una vez por engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        record = {
+            "ts": time.time(),
+            "statement": _normalize(statement),
+            "ms": elapsed_ms,
+            "rows": max(cursor.rowcount, 0) if cursor.rowcount is not None else 0,
+            "origin": _origin.get(),
+        }
+        with _lock:
+            _records.append(record)
+            if elapsed_ms >= SLOW_QUERY_MS:
+                _slow.append(record)
+        if elapsed_ms >= SLOW_QUERY_MS:
+            slow_log.warning("%.1f ms [%s] %s", elapsed_ms, record["origin"], record["statement"][:500])
+
+    @event.listens_for(engine, "handle_error")
+    def _discard(context):
+        # La sentencia falló: no hay after_cursor_execute, descartamos su inicio
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+def records():
+    with _lock:
+        return pd.DataFrame(list(_records), columns=["ts", "statement", "ms", "rows", "origin"])
+
+
+def slow_queries():
+    with _lock:
+        df = pd.DataFrame(list(_slow), columns=["ts", "statement", "ms", "rows", "origin"])
+    df["ts"] = pd.to_datetime(df["ts"], unit="s")
+    return df.sort_values("ts", ascending=False)
+
+
+def clear():
+    with _lock:
+        _records.clear()
+        _slow.clear()
+
+
+def summary():
+    """Agrupa el buffer por sentencia: llamadas, tiempo total, promedio, p95 y filas."""
+    df = records()
+    if df.empty:
+        return pd.DataFrame(columns=["statement", "origins", "calls", "total_ms", "mean_ms", "p95_ms", "rows"])
+    grouped = df.groupby("statement")
+    out = pd.DataFrame({
+        "origins": grouped["origin"].agg(lambda s: ", ".join(sorted(set(s)))),
+        "calls": grouped.size(),
+        "total_ms": grouped["ms"].sum().round(2),
+        "mean_ms": grouped["ms"].mean().round(2),
+        "p95_ms": grouped["ms"].quantile(0.95).round(2),
+        "rows": grouped["rows"].sum(),
+    }).reset_index()
+    return out.sort_values("total_ms", ascending=False)
+
+
+def _query_id(statement):
+    return hashlib.sha1(statement.encode("utf-8")).hexdigest()[:10]
+
+
+def prometheus_text():
+    """Exporta el resumen en formato de exposición de Prometheus (texto)."""
+    lines = [
+        "# HELP app_query_calls_total Sentencias ejecutadas (ventana del ring buffer).",
+        "# TYPE app_query_calls_total counter",
+        "# HELP app_query_duration_ms_total Tiempo total en ms (ventana del ring buffer).",
+        "# TYPE app_query_duration_ms_total counter",
+        "# HELP app_query_duration_ms_p95 Percentil 95 de latencia en ms.",
+        "# TYPE app_query_duration_ms_p95 gauge",
+    ]
+    for row in summary().itertuples(index=False):
+        qid = _query_id(row.statement)
+        lines.append(f"# query {qid}: {row.statement[:200]}")
+        lines.append(f'app_query_calls_total{{query="{qid}"}} {row.calls}')
+        lines.append(f'app_query_duration_ms_total{{query="{qid}"}} {row.total_ms}')
+        lines.append(f'app_query_duration_ms_p95{{query="{qid}"}} {row.p95_ms}')
+    return "\n".join(lines) + "\n"
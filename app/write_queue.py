@@ -0,0 +1,254 @@
+"""Cola de escritura diferida (write-behind) para las partidas.
+
+Con WRITE_BEHIND=true el botón "Guardar Partida" no espera a Postgres: la
+partida se anota en un journal SQLite local (durable, sobrevive a un
+reinicio) y un hilo único por proceso las graba en lotes, todas las del
+lote en una misma transacción (group commit). En noches con varias mesas
+cargando a la vez eso reemplaza N transacciones sincrónicas por una.
+
+Cada envío lleva una clave de idempotencia generada por el formulario: el
+journal la tiene como PRIMARY KEY, así que un doble click o un reintento
+con la misma clave no encola dos veces. La misma clave viaja a
+matches.submission_key, así que si el proceso se corta entre el COMMIT en
+Postgres y la marca en el journal, el reintento no duplica la partida.
+
+Las entradas pasan por 'pending' -> 'done' (con el match_id) o 'failed'
+(con el error). Si se cae la conexión a Postgres el lote queda pendiente y
+se reintenta. Para vaciar la cola sin la app levantada:
+
+    uv run python -m app.write_queue drain
+    uv run python -m app.write_queue status
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import streamlit as st
+from sqlalchemy import exc
+
+from app import analytics, awards, data, matches, telemetry
+from app.database import _env_bool, get_engine
+
+logger = logging.getLogger(__name__)
+
+ENABLED = _env_bool("WRITE_BEHIND", False)
+QUEUE_PATH = Path(os.getenv("WRITE_QUEUE_PATH", Path(__file__).resolve().parent.parent / "write_queue.db"))
+BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "50"))
+# Espera corta después del primer envío para juntar los de las otras mesas
+BATCH_LINGER_SECONDS = float(os.getenv("WRITE_BATCH_LINGER_MS", "200")) / 1000
+# Las entradas ya grabadas se borran del journal pasado este tiempo
+KEEP_DONE_SECONDS = 24 * 3600
+
+SQL_JOURNAL = """
+    CREATE TABLE IF NOT EXISTS journal (
+        key TEXT PRIMARY KEY,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        match_id INTEGER,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        done_at REAL
+    )
+"""
+
+
+def _connect():
+    conn = sqlite3.connect(QUEUE_PATH, timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = FULL")
+    conn.execute(SQL_JOURNAL)
+    conn.execute("CREATE INDEX IF NOT EXISTS journal_status ON journal (status, created_at)")
+    return conn
+
+
+def enqueue(key, group_id, session_id, game_id, winner_id, win_type, duration, player_ids):
+    """Anota una partida en el journal. Devuelve False si la clave ya estaba."""
+    payload = {
+        "group_id": int(group_id),
+        "session_id": int(session_id),
+        "game_id": int(game_id),
+        "winner_id": int(winner_id),
+        "win_type": win_type,
+        "duration": int(duration),
+        "player_ids": [int(p) for p in player_ids],
+    }
+    conn = _connect()
+    try:
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO journal (key, payload, created_at) VALUES (?, ?, ?)",
+            (key, json.dumps(payload), time.time()),
+        ).rowcount
+    finally:
+        conn.close()
+    if inserted:
+        get_worker().wake()
+    return bool(inserted)
+
+
+def status(keys):
+    """Estado de las claves pedidas: {key: {"status", "match_id", "result", "error"}}."""
+    if not keys:
+        return {}
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            f"SELECT key, status, match_id, result, error FROM journal WHERE key IN ({', '.join('?' * len(keys))})",
+            list(keys),
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        key: {"status": state, "match_id": match_id, "result": json.loads(result) if result else None, "error": error}
+        for key, state, match_id, result, error in rows
+    }
+
+
+def counts():
+    """Cantidad de entradas por estado ({"pending": n, "done": n, "failed": n})."""
+    conn = _connect()
+    try:
+        found = dict(conn.execute("SELECT status, COUNT(*) FROM journal GROUP BY status").fetchall())
+    finally:
+        conn.close()
+    return {name: found.get(name, 0) for name in ("pending", "done", "failed")}
+
+
+def _record(conn, key, payload):
+    """Graba una partida (y La Meta de los 5) en la transacción del lote.
+
+    Si la clave ya estaba en matches (reintento después de un corte)
+    devuelve (None, None) sin tocar nada.
+    """
+    match_id = matches.record_match(
+        conn, payload["session_id"], payload["game_id"], payload["winner_id"],
+        payload["win_type"], payload["duration"], payload["player_ids"], submission_key=key,
+    )
+    if match_id is None:
+        return None, None
+    return match_id, awards.apply_match(conn, match_id)
+
+
+def _error_text(e):
+    # pg8000 trae el error como dict ({"M": mensaje, ...}); psycopg2 como texto
+    detail = e.orig.args[0] if e.orig.args else e.orig
+    return detail.get("M", str(detail)) if isinstance(detail, dict) else str(detail)
+
+
+def flush(engine, limit=BATCH_SIZE):
+    """Graba hasta `limit` entradas pendientes en una sola transacción.
+
+    Cada partida va en un SAVEPOINT: si una falla (por ejemplo, un jugador
+    borrado) se marca 'failed' sin tirar abajo el resto del lote. Si lo que
+    falla es la conexión, todo queda 'pending' para el próximo intento.
+    Devuelve (partidas grabadas, entradas procesadas).
+    """
+    journal = _connect()
+    try:
+        pending = journal.execute(
+            "SELECT key, payload FROM journal WHERE status = 'pending' ORDER BY created_at LIMIT ?", (limit,)
+        ).fetchall()
+        if not pending:
+            return 0, 0
+
+        done, failed, touched = [], [], set()
+        with engine.begin() as conn:
+            for key, payload in pending:
+                try:
+                    payload = json.loads(payload)
+                    with conn.begin_nested():
+                        match_id, premio = _record(conn, key, payload)
+                    done.append((match_id, json.dumps(premio) if premio else None, time.time(), key))
+                    touched.add((payload.get("group_id"), payload["game_id"]))
+                except exc.DBAPIError as e:
+                    if e.connection_invalidated:
+                        raise
+                    failed.append((_error_text(e), time.time(), key))
+                except (KeyError, TypeError, ValueError) as e:
+                    failed.append((f"payload inválido: {e}", time.time(), key))
+
+        now = time.time()
+        journal.execute("BEGIN")
+        journal.executemany(
+            "UPDATE journal SET status = 'done', match_id = ?, result = ?, done_at = ? WHERE key = ?", done
+        )
+        journal.executemany("UPDATE journal SET status = 'failed', error = ?, done_at = ? WHERE key = ?", failed)
+        journal.execute("DELETE FROM journal WHERE status = 'done' AND done_at < ?", (now - KEEP_DONE_SECONDS,))
+        journal.execute("COMMIT")
+    finally:
+        journal.close()
+
+    if done:
+        # Solo los caches de las cofradías y juegos que recibieron partidas
+        # (las entradas encoladas antes de las cofradías no traen group_id: se invalida todo)
+        for group_id in {group_id for group_id, _ in touched}:
+            data.invalidate("matches", group_id=group_id)
+        data.invalidate(*[f"game:{game_id}" for _, game_id in touched])
+    return len(done), len(pending)
+
+
+class WriteQueueWorker(threading.Thread):
+    """Hilo que vacía el journal en lotes apenas llega un envío."""
+
+    def __init__(self, engine, on_commit=None):
+        super().__init__(name="write-queue", daemon=True)
+        self.engine = engine
+        self.on_commit = on_commit
+        self._wake = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def run(self):
+        telemetry.set_origin("write_queue:flush")
+        while True:
+            # Sin avisos igual revisamos cada tanto: quedan pendientes de un reinicio o de un corte
+            self._wake.wait(5)
+            self._wake.clear()
+            time.sleep(BATCH_LINGER_SECONDS)
+            try:
+                while True:
+                    written, processed = flush(self.engine)
+                    if self.on_commit:
+                        for _ in range(written):
+                            self.on_commit()
+                    if processed < BATCH_SIZE:
+                        break
+            except Exception:
+                logger.exception("Error grabando un lote de la cola")
+
+
+@st.cache_resource
+def get_worker():
+    """Arranca (una sola vez por proceso) el hilo de la cola."""
+    worker = WriteQueueWorker(get_engine(), on_commit=analytics.match_recorded)
+    worker.start()
+    return worker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cola de escritura de partidas")
+    parser.add_argument("command", choices=["drain", "status"])
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        print(", ".join(f"{name}: {n}" for name, n in counts().items()))
+        return
+
+    engine = get_engine()
+    total = 0
+    while True:
+        written, processed = flush(engine)
+        total += written
+        if processed < BATCH_SIZE:
+            break
+    print(f"{total} partidas grabadas. Quedan: {counts()}")
+
+
+if __name__ == "__main__":
+    main()
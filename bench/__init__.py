@@ -0,0 +1,4 @@
+"""Benchmarks de las consultas de la app sobre datos sintéticos.
+
+    uv run python -m bench --scale 10 --runs 50 --out bench_results.json
+"""
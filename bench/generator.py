@@ -0,0 +1,101 @@
+"""Generador determinístico de datos sintéticos (misma semilla, mismos datos).
+
+`scale=1` se parece a un grupo real: una docena de jugadores y unas cien
+juntadas. Las juntadas y partidas crecen linealmente con la escala; los
+jugadores y juegos crecen más despacio, como pasaría en la vida real.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from app import history
+
+BASE_SESSIONS = 100
+WIN_TYPES = np.array(history.WIN_TYPES)
+GAME_TYPES = np.array(["Principal", "Casual", "Party Game", "co-op", "Cartas", "CATAN"])
+FOODS = np.array(["Pizzas", "Asado", "Empanadas", "Hamburguesas", "Sushi"])
+
+# Bloque de partidas para elegir mesas sin armar una matriz gigante de una vez
+_BLOCK = 20_000
+
+
+def generate(scale=1, seed=42):
+    """Devuelve {tabla: DataFrame} con players, games, sessions, matches y match_participants."""
+    rng = np.random.default_rng(seed)
+    n_players = max(8, int(round(12 * np.sqrt(scale))))
+    n_games = max(5, int(round(15 * np.sqrt(scale))))
+    n_sessions = int(BASE_SESSIONS * scale)
+
+    players = pd.DataFrame({
+        "player_id": np.arange(1, n_players + 1),
+        "name": [f"Caballero {i}" for i in range(1, n_players + 1)],
+        "nickname": [f"caballero_{i}" for i in range(1, n_players + 1)],
+        "active": rng.random(n_players) < 0.9,
+        "created_at": pd.Timestamp("2015-01-01"),
+        "birth_date": [date(1980, 1, 1) + timedelta(days=int(d)) for d in rng.integers(0, 7000, n_players)],
+        "owned_games": rng.integers(0, 30, n_players),
+        "role": "Jugador",
+    })
+
+    games = pd.DataFrame({
+        "game_id": np.arange(1, n_games + 1),
+        "name": [f"Juego {i}" for i in range(1, n_games + 1)],
+        "logo": "🎲",
+        "min_players": 2,
+        "max_players": 6,
+        "type": rng.choice(GAME_TYPES, n_games),
+        "owner_id": rng.integers(1, n_players + 1, n_games),
+    })
+
+    # Una juntada por día (la app no permite dos en la misma fecha)
+    start = date(2015, 1, 1)
+    sessions = pd.DataFrame({
+        "session_id": np.arange(1, n_sessions + 1),
+        "date": [start + timedelta(days=i) for i in range(n_sessions)],
+        "host_id": rng.integers(1, n_players + 1, n_sessions),
+        "food": rng.choice(FOODS, n_sessions),
+        "cost_per_person": rng.integers(1, 20, n_sessions) * 1000,
+        "total_attendees": rng.integers(3, 9, n_sessions),
+    })
+
+    per_session = rng.integers(2, 9, n_sessions)
+    match_session = np.repeat(sessions["session_id"].to_numpy(), per_session)
+    n_matches = len(match_session)
+    table_size = np.minimum(rng.integers(2, 7, n_matches), n_players)
+
+    # Jugadores de cada partida: los primeros `table_size` de una permutación aleatoria.
+    # El primero de la mesa es el ganador.
+    mp_match, mp_player, mp_rank, winners = [], [], [], np.empty(n_matches, dtype=np.int64)
+    for a in range(0, n_matches, _BLOCK):
+        b = min(a + _BLOCK, n_matches)
+        order = np.argsort(rng.random((b - a, n_players)), axis=1) + 1
+        seats = np.arange(n_players) < table_size[a:b, None]
+        rows, cols = np.nonzero(seats)
+        mp_match.append(rows + a + 1)
+        mp_player.append(order[rows, cols])
+        mp_rank.append(np.where(cols == 0, 1, 2))
+        winners[a:b] = order[:, 0]
+
+    matches = pd.DataFrame({
+        "match_id": np.arange(1, n_matches + 1),
+        "session_id": match_session,
+        "game_id": rng.integers(1, n_games + 1, n_matches),
+        "winner_id": winners,
+        "win_type": rng.choice(WIN_TYPES, n_matches, p=[0.7, 0.2, 0.1]),
+        "duration_minutes": rng.integers(1, 25, n_matches) * 5,
+    })
+
+    participants = pd.DataFrame({
+        "match_id": np.concatenate(mp_match),
+        "player_id": np.concatenate(mp_player),
+        "rank": np.concatenate(mp_rank),
+    })
+
+    return {
+        "players": players,
+        "games": games,
+        "sessions": sessions,
+        "matches": matches,
+        "match_participants": participants,
+    }
@@ -0,0 +1,232 @@
+"""Carga datos sintéticos con COPY y mide cada consulta de la app.
+
+Usa una base aparte (por defecto `leaderboard_bench`) en el mismo servidor
+que DB_*: la crea si no existe (y se niega a cargar en una que no termine
+en `_bench`, salvo con `--force`), aplica init.sql + migraciones, carga los
+datos generados y corre cada consulta `--runs` veces. El resultado (p50,
+p95, p99, filas y bytes) se guarda en JSON para comparar entre commits.
+
+Los bytes son el tamaño en texto UTF-8 de los valores devueltos: una
+aproximación de lo que viaja por la red, suficiente para comparar corridas.
+"""
+import argparse
+import io
+import json
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from app import analytics, data, game_stats, history, matches, migrate, ratings, rivalries, stats
+from app.database import get_db_url
+from bench.generator import generate
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Orden de carga (respeta las claves foráneas) y secuencias a ajustar después del COPY
+TABLES = [
+    ("players", "player_id"),
+    ("games", "game_id"),
+    ("sessions", "session_id"),
+    ("matches", "match_id"),
+    ("match_participants", None),
+]
+
+
+def app_queries():
+    """(nombre, sql, parámetros) de cada consulta que hace la app al renderizar."""
+    g = {"group_id": 1}
+    queries = [
+        ("hosts", data.SQL_HOSTS, g),
+        ("games", data.SQL_GAMES, g),
+        ("form_lookup", data.SQL_FORM_LOOKUP, {**g, "limit": 10}),
+        ("session_recent_matches", matches.SQL_SESSION_RECENT, {**g, "s": 1, "limit": 5}),
+        ("leaderboard", stats.SQL_LEADERBOARD, g),
+        ("leaderboard_season", stats.SQL_PERIOD_LEADERBOARD, {**g, "date_from": "2015-01-01", "date_to": "2016-01-01"}),
+        ("leaderboard_last_sessions_from", stats.SQL_LAST_SESSIONS_FROM, {**g, "n": 5}),
+        ("recent_form", stats.SQL_RECENT_FORM, {**g, "n": stats.STREAK_LOOKBACK}),
+        ("game_report_one", game_stats.SQL_GAME_REPORT, {"games": [1]}),
+        ("game_report_all", game_stats.SQL_GAME_REPORT, {"games": list(range(1, 101))}),
+        ("rivalries_pending", rivalries.SQL_PENDING, {**g, "seen": "1000000:1000000:"}),
+        ("admin_players_view", data.SQL_PLAYERS_VIEW, g),
+        ("admin_games_view", data.SQL_GAMES_VIEW, g),
+        ("analytics_player_totals", analytics.SQL_PLAYER_TOTALS, g),
+        ("analytics_game_win_rates", analytics.SQL_GAME_WIN_RATES, g),
+        ("analytics_session_summary", analytics.SQL_SESSION_SUMMARY, g),
+    ]
+    pages = {
+        "history_first_page": {},
+        "history_by_game": {"game_id": 1},
+        "history_by_winner": {"winner_id": 1},
+        "history_by_date": {"date_from": "2015-06-01", "date_to": "2015-12-31"},
+    }
+    for name, kwargs in pages.items():
+        clauses, params = history.build_filters(**kwargs)
+        where = f"WHERE {' AND '.join(['m.group_id = :group_id', *clauses])}"
+        params.update(g, limit=history.PAGE_SIZE + 1)
+        queries.append((name, history.SQL_PAGE.format(where=where), params))
+    return queries
+
+
+# --- PREPARACIÓN DE LA BASE ---
+
+def ensure_database(name):
+    """Crea la base de benchmark si no existe."""
+    admin = create_engine(get_db_url(name="postgres"), isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        exists = conn.execute(text("SELECT 1 FROM pg_database WHERE datname = :n"), {"n": name}).scalar()
+        if not exists:
+            conn.exec_driver_sql(f'CREATE DATABASE "{name}"')
+    admin.dispose()
+
+
+def is_bench_database(name):
+    return name.endswith("_bench")
+
+
+def reset_schema(engine, force=False):
+    """Deja la base vacía con el esquema actual (init.sql + migraciones).
+
+    Borra todo el esquema public: sin `force` solo acepta bases *_bench.
+    """
+    if not (force or is_bench_database(engine.url.database)):
+        raise ValueError(f"{engine.url.database} no es una base de benchmark (*_bench); no se borra")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP SCHEMA public CASCADE")
+        conn.exec_driver_sql("CREATE SCHEMA public")
+        for statement in migrate.split_statements((ROOT / "sql" / "init.sql").read_text(encoding="utf-8")):
+            conn.exec_driver_sql(statement)
+        # Los juegos de ejemplo de init.sql chocarían con los ids generados
+        conn.exec_driver_sql("TRUNCATE games CASCADE")
+    migrate.migrate(engine, log=lambda _: None)
+
+
+def _copy(engine, table, df):
+    """COPY ... FROM STDIN con el driver que esté en uso."""
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    sql = f"COPY {table} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)"
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if engine.dialect.driver == "psycopg2":
+            cursor.copy_expert(sql, buf)
+        else:
+            cursor.execute(sql, stream=buf)
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def load(engine, tables):
+    """Carga los DataFrames generados y recalcula las tablas derivadas."""
+    timings = {}
+    for table, serial in TABLES:
+        started = time.perf_counter()
+        _copy(engine, table, tables[table])
+        timings[table] = round(time.perf_counter() - started, 3)
+        if serial:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{serial}'), (SELECT MAX({serial}) FROM {table}))"
+                ))
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        stats.rebuild(conn)
+    analytics.refresh(engine)
+    ratings.update(engine, full=True)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    timings["derived"] = round(time.perf_counter() - started, 3)
+    return timings
+
+
+# --- MEDICIÓN ---
+
+def _payload_bytes(rows):
+    return sum(len(str(v).encode("utf-8")) for row in rows for v in row if v is not None)
+
+
+def measure(engine, runs, warmup=2):
+    """Corre cada consulta `runs` veces y devuelve percentiles de latencia, filas y bytes."""
+    results = {}
+    with engine.connect() as conn:
+        for name, sql, params in app_queries():
+            statement = text(sql)
+            for _ in range(warmup):
+                conn.execute(statement, params).fetchall()
+            latencies = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                rows = conn.execute(statement, params).fetchall()
+                latencies.append((time.perf_counter() - started) * 1000)
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            results[name] = {
+                "runs": runs,
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "mean_ms": round(float(np.mean(latencies)), 3),
+                "rows": len(rows),
+                "bytes": _payload_bytes(rows),
+            }
+            conn.rollback()
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de las consultas de la app")
+    parser.add_argument("--scale", type=float, default=1, help="1 = un grupo real; 10 y 100 para estresar")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--database", default="leaderboard_bench")
+    parser.add_argument("--driver", default=None, help="pg8000 o psycopg2 (por defecto, DB_DRIVER)")
+    parser.add_argument("--skip-load", action="store_true", help="reusar los datos ya cargados")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--force", action="store_true", help="permitir cargar en una base que no termina en _bench")
+    args = parser.parse_args(argv)
+    if not (args.skip_load or args.force or is_bench_database(args.database)):
+        parser.error(f"la carga borra el esquema de --database; {args.database} no termina en _bench (usar --force)")
+
+    ensure_database(args.database)
+    engine = create_engine(get_db_url(driver=args.driver, name=args.database))
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "driver": engine.dialect.driver,
+        "scale": args.scale,
+        "seed": args.seed,
+    }
+
+    if not args.skip_load:
+        print(f"Generando datos (scale={args.scale}, seed={args.seed})...", flush=True)
+        tables = generate(args.scale, args.seed)
+        report["rows"] = {name: len(df) for name, df in tables.items()}
+        reset_schema(engine, force=args.force)
+        print("Cargando con COPY...", flush=True)
+        report["load_seconds"] = load(engine, tables)
+
+    print(f"Midiendo {args.runs} corridas por consulta...", flush=True)
+    report["queries"] = measure(engine, args.runs)
+
+    Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    width = max(len(name) for name in report["queries"])
+    for name, r in report["queries"].items():
+        print(f"  {name:<{width}}  p50 {r['p50_ms']:>8.2f} ms  p95 {r['p95_ms']:>8.2f} ms  "
+              f"p99 {r['p99_ms']:>8.2f} ms  {r['rows']:>6} filas  {r['bytes']:>9} bytes")
+    print(f"Resultados en {args.out}")
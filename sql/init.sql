@@ -38,7 +38,7 @@ CREATE TABLE IF NOT EXISTS matches (
     session_id INTEGER REFERENCES sessions(session_id),
     game_id INTEGER REFERENCES games(game_id),
     winner_id INTEGER REFERENCES players(player_id),
-    win_type VARCHAR(50) -- 'Normal', 'Clutch', 'Paliza'
+    win_type VARCHAR(50) -- 'Normal', 'Clutch (Sufrida)', 'Paliza' (app/history.py)
 );
 
 -- TABLA DE PARTICIPANTES POR PARTIDA
@@ -50,6 +50,16 @@ CREATE TABLE IF NOT EXISTS match_participants (
     PRIMARY KEY (match_id, player_id)
 );
 
+-- RESUMEN POR JUGADOR (se actualiza en la misma transacción que cada partida)
+-- Se puede reconstruir con: uv run python -m app.stats rebuild
+CREATE TABLE IF NOT EXISTS player_stats (
+    player_id INTEGER PRIMARY KEY REFERENCES players(player_id),
+    matches_played INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    runner_ups INTEGER NOT NULL DEFAULT 0,
+    last_played DATE
+);
+
 -- RELACIÓN CIRCULAR (Jugador -> Juego Favorito)
 -- Lo hacemos al final porque antes no existía la tabla games
 ALTER TABLE players 
@@ -0,0 +1,6 @@
+-- Columnas que la app ya usa y que init.sql nunca creó
+ALTER TABLE sessions ADD COLUMN IF NOT EXISTS food VARCHAR(200);
+ALTER TABLE sessions ADD COLUMN IF NOT EXISTS cost_per_person INTEGER;
+ALTER TABLE sessions ADD COLUMN IF NOT EXISTS total_attendees INTEGER;
+
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS duration_minutes INTEGER;
@@ -0,0 +1,18 @@
+-- Índices alineados con las consultas reales de la app
+
+-- Últimas sesiones (ORDER BY date DESC LIMIT) y filtro por rango de fechas del historial
+CREATE INDEX IF NOT EXISTS idx_sessions_date ON sessions (date);
+
+-- Partidas de una sesión (filtro por fecha del historial, importador)
+CREATE INDEX IF NOT EXISTS idx_matches_session ON matches (session_id, match_id);
+
+-- Historial filtrado por juego / ganador / tipo, paginado por match_id (keyset)
+CREATE INDEX IF NOT EXISTS idx_matches_game ON matches (game_id, match_id);
+CREATE INDEX IF NOT EXISTS idx_matches_winner ON matches (winner_id, match_id);
+CREATE INDEX IF NOT EXISTS idx_matches_win_type ON matches (win_type, match_id);
+
+-- Partidas de un jugador (la PK es (match_id, player_id) y no sirve para esto)
+CREATE INDEX IF NOT EXISTS idx_match_participants_player ON match_participants (player_id, match_id) INCLUDE (rank);
+
+-- Listas de jugadores activos (desplegables)
+CREATE INDEX IF NOT EXISTS idx_players_active ON players (nickname) WHERE active = TRUE;
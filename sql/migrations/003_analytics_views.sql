@@ -0,0 +1,77 @@
+-- Vistas materializadas para la analítica (OLAP). Se refrescan en segundo plano
+-- con REFRESH MATERIALIZED VIEW CONCURRENTLY (ver app/analytics.py), por eso
+-- cada una tiene un índice único.
+
+-- Totales por jugador
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_player_totals AS
+SELECT
+    mp.player_id,
+    COUNT(*) AS matches_played,
+    SUM(CASE WHEN mp.rank = 1 THEN 1 ELSE 0 END) AS wins,
+    SUM(CASE WHEN mp.rank = 2 THEN 1 ELSE 0 END) AS runner_ups,
+    COUNT(DISTINCT m.session_id) AS sessions_played,
+    COUNT(DISTINCT m.game_id) AS games_played,
+    ROUND(AVG(m.duration_minutes), 1) AS avg_duration,
+    ROUND(100.0 * SUM(CASE WHEN mp.rank = 1 THEN 1 ELSE 0 END) / COUNT(*), 1) AS win_rate
+FROM match_participants mp
+JOIN matches m ON m.match_id = mp.match_id
+GROUP BY mp.player_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_player_totals ON mv_player_totals (player_id);
+
+-- Win rate por juego y jugador
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_game_win_rates AS
+SELECT
+    m.game_id,
+    mp.player_id,
+    COUNT(*) AS matches_played,
+    SUM(CASE WHEN mp.rank = 1 THEN 1 ELSE 0 END) AS wins,
+    ROUND(100.0 * SUM(CASE WHEN mp.rank = 1 THEN 1 ELSE 0 END) / COUNT(*), 1) AS win_rate
+FROM match_participants mp
+JOIN matches m ON m.match_id = mp.match_id
+GROUP BY m.game_id, mp.player_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_game_win_rates ON mv_game_win_rates (game_id, player_id);
+
+-- Resumen por sesión (juntada)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_session_summary AS
+SELECT
+    s.session_id,
+    s.date,
+    s.host_id,
+    COUNT(DISTINCT m.match_id) AS matches_played,
+    COUNT(DISTINCT mp.player_id) AS players,
+    COALESCE(SUM(m.duration_minutes) FILTER (WHERE mp.rank = 1), 0) AS total_minutes,
+    MODE() WITHIN GROUP (ORDER BY m.winner_id) FILTER (WHERE mp.rank = 1) AS top_winner_id
+FROM sessions s
+LEFT JOIN matches m ON m.session_id = s.session_id
+LEFT JOIN match_participants mp ON mp.match_id = m.match_id
+GROUP BY s.session_id, s.date, s.host_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_session_summary ON mv_session_summary (session_id);
+
+-- Cara a cara: para cada par de jugadores, partidas compartidas y quién ganó más
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_head_to_head AS
+SELECT
+    a.player_id AS player_id,
+    b.player_id AS rival_id,
+    COUNT(*) AS shared_matches,
+    SUM(CASE WHEN a.rank = 1 THEN 1 ELSE 0 END) AS wins,
+    SUM(CASE WHEN b.rank = 1 THEN 1 ELSE 0 END) AS rival_wins
+FROM match_participants a
+JOIN match_participants b ON b.match_id = a.match_id AND b.player_id <> a.player_id
+GROUP BY a.player_id, b.player_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_head_to_head ON mv_head_to_head (player_id, rival_id);
+
+-- Registro de refrescos: cuándo y hasta qué partida está cada vista
+CREATE TABLE IF NOT EXISTS analytics_refresh (
+    view_name VARCHAR(100) PRIMARY KEY,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_match_id INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT INTO analytics_refresh (view_name, last_match_id)
+SELECT v, COALESCE((SELECT MAX(match_id) FROM matches), 0)
+FROM unnest(ARRAY['mv_player_totals', 'mv_game_win_rates', 'mv_session_summary', 'mv_head_to_head']) AS v
+ON CONFLICT (view_name) DO NOTHING;
@@ -0,0 +1,16 @@
+-- Rating estilo Elo por jugador (ver app/ratings.py)
+CREATE TABLE IF NOT EXISTS player_ratings (
+    player_id INTEGER PRIMARY KEY REFERENCES players(player_id),
+    rating DOUBLE PRECISION NOT NULL DEFAULT 1500,
+    matches_rated INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Hasta qué partida está procesado el rating (una sola fila)
+CREATE TABLE IF NOT EXISTS rating_checkpoint (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    last_match_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO rating_checkpoint (id, last_match_id) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,34 @@
+-- "La Meta de los 5" (ver app/pages/rules.py y app/awards.py)
+
+-- Victorias acumuladas desde el último premio y Plusvalía Histórica (PV) por jugador
+CREATE TABLE IF NOT EXISTS award_counters (
+    player_id INTEGER PRIMARY KEY REFERENCES players(player_id),
+    wins_since_award INTEGER NOT NULL DEFAULT 0,
+    streak_start_match_id INTEGER REFERENCES matches(match_id),
+    pv INTEGER NOT NULL DEFAULT 0
+);
+
+-- Quiénes jugaron al menos una partida durante la racha abierta de cada jugador
+CREATE TABLE IF NOT EXISTS award_streak_players (
+    player_id INTEGER REFERENCES players(player_id),
+    participant_id INTEGER REFERENCES players(player_id),
+    PRIMARY KEY (player_id, participant_id)
+);
+
+-- Premios otorgados
+CREATE TABLE IF NOT EXISTS award_events (
+    award_id SERIAL PRIMARY KEY,
+    player_id INTEGER NOT NULL REFERENCES players(player_id),
+    match_id INTEGER NOT NULL REFERENCES matches(match_id),
+    streak_start_match_id INTEGER REFERENCES matches(match_id),
+    awarded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- El Tributo: quién le debe cuánto a quién por cada premio
+CREATE TABLE IF NOT EXISTS award_tributes (
+    award_id INTEGER REFERENCES award_events(award_id),
+    player_id INTEGER REFERENCES players(player_id),
+    amount_usd NUMERIC(6, 2) NOT NULL DEFAULT 2,
+    paid BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (award_id, player_id)
+);
@@ -0,0 +1,32 @@
+-- Escrituras idempotentes: reintentos y dobles clicks no duplican datos
+
+-- Clave de envío generada por el formulario (o la cola de escritura).
+-- Las partidas importadas o viejas quedan en NULL, que nunca choca.
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS submission_key VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_matches_submission_key ON matches (submission_key);
+
+-- Una juntada por fecha. Si ya hay fechas con más de una, la migración se
+-- detiene y las lista: cada juntada tiene su anfitrión, comida y costo, y
+-- elegir con cuál quedarse es una decisión que hay que tomar a mano.
+DO $$
+DECLARE
+    duplicated TEXT;
+BEGIN
+    SELECT string_agg(date::text || ' (juntadas ' || ids || ')', ', ' ORDER BY date) INTO duplicated
+    FROM (
+        SELECT date, string_agg(session_id::text, ', ' ORDER BY session_id) AS ids
+        FROM sessions
+        GROUP BY date
+        HAVING COUNT(*) > 1
+    ) d;
+    IF duplicated IS NOT NULL THEN
+        RAISE EXCEPTION 'Hay fechas con más de una juntada: %', duplicated
+            USING HINT = 'Mové las partidas de cada fecha a una sola juntada (UPDATE matches SET session_id = ...), '
+                         'pasale los datos de comida/costo que correspondan, borrá las demás y volvé a correr las migraciones.';
+    END IF;
+END
+$$;
+
+-- El índice único reemplaza al de la migración 002 para las búsquedas por fecha
+CREATE UNIQUE INDEX IF NOT EXISTS ux_sessions_date ON sessions (date);
+DROP INDEX IF EXISTS idx_sessions_date;
@@ -0,0 +1,31 @@
+-- Resumen por jugador y por juntada: los rankings por temporada, mes o
+-- últimas N juntadas suman estas filas en lugar de recorrer matches.
+-- Se actualiza en la misma transacción que cada partida (app/matches.py)
+-- y se reconstruye junto con player_stats: uv run python -m app.stats rebuild
+CREATE TABLE IF NOT EXISTS player_session_stats (
+    player_id INTEGER REFERENCES players(player_id),
+    session_id INTEGER REFERENCES sessions(session_id),
+    session_date DATE NOT NULL,
+    matches_played INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    runner_ups INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player_id, session_id)
+);
+
+-- Cualquier ventana de fechas se responde con un rango sobre este índice
+CREATE INDEX IF NOT EXISTS idx_player_session_stats_date
+    ON player_session_stats (session_date) INCLUDE (player_id, matches_played, wins, runner_ups);
+
+INSERT INTO player_session_stats (player_id, session_id, session_date, matches_played, wins, runner_ups)
+SELECT
+    mp.player_id,
+    s.session_id,
+    s.date,
+    COUNT(*),
+    SUM(CASE WHEN mp.rank = 1 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN mp.rank = 2 THEN 1 ELSE 0 END)
+FROM match_participants mp
+JOIN matches m ON m.match_id = mp.match_id
+JOIN sessions s ON s.session_id = m.session_id
+GROUP BY mp.player_id, s.session_id, s.date
+ON CONFLICT (player_id, session_id) DO NOTHING;
@@ -0,0 +1,53 @@
+-- Cofradías: varios grupos de juego en la misma instalación.
+-- Jugadores, juegos, juntadas y partidas pertenecen a una cofradía. Lo que
+-- ya estaba cargado queda en la cofradía 1 (también es el valor por defecto,
+-- así una instalación de un solo grupo sigue funcionando igual).
+CREATE TABLE IF NOT EXISTS groups (
+    group_id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE,
+    slug VARCHAR(50) NOT NULL UNIQUE,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO groups (group_id, name, slug) VALUES (1, 'Noche de Caballeros', 'caballeros')
+ON CONFLICT DO NOTHING;
+SELECT setval(pg_get_serial_sequence('groups', 'group_id'), (SELECT MAX(group_id) FROM groups));
+
+ALTER TABLE players ADD COLUMN IF NOT EXISTS group_id INTEGER NOT NULL DEFAULT 1 REFERENCES groups(group_id);
+ALTER TABLE games ADD COLUMN IF NOT EXISTS group_id INTEGER NOT NULL DEFAULT 1 REFERENCES groups(group_id);
+ALTER TABLE sessions ADD COLUMN IF NOT EXISTS group_id INTEGER NOT NULL DEFAULT 1 REFERENCES groups(group_id);
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS group_id INTEGER NOT NULL DEFAULT 1 REFERENCES groups(group_id);
+
+-- La partida es de la cofradía de su juntada (se copia para filtrar sin join)
+UPDATE matches m SET group_id = s.group_id
+FROM sessions s
+WHERE s.session_id = m.session_id AND m.group_id <> s.group_id;
+
+ALTER TABLE sessions ADD CONSTRAINT ux_sessions_session_group UNIQUE (session_id, group_id);
+ALTER TABLE matches ADD CONSTRAINT fk_matches_session_group
+    FOREIGN KEY (session_id, group_id) REFERENCES sessions (session_id, group_id);
+
+-- Unicidades que pasan a ser por cofradía: una juntada por fecha y un juego por nombre
+CREATE UNIQUE INDEX IF NOT EXISTS ux_sessions_group_date ON sessions (group_id, date);
+DROP INDEX IF EXISTS ux_sessions_date;
+ALTER TABLE games DROP CONSTRAINT IF EXISTS games_name_key;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_games_group_name ON games (group_id, name);
+
+-- Todas las lecturas filtran por cofradía: los índices empiezan por group_id,
+-- así un grupo chico no recorre las filas de uno grande
+CREATE INDEX IF NOT EXISTS idx_players_group ON players (group_id, player_id);
+CREATE INDEX IF NOT EXISTS idx_players_group_active ON players (group_id, nickname) WHERE active = TRUE;
+DROP INDEX IF EXISTS idx_players_active;
+CREATE INDEX IF NOT EXISTS idx_matches_group ON matches (group_id, match_id);
+CREATE INDEX IF NOT EXISTS idx_matches_group_win_type ON matches (group_id, win_type, match_id);
+DROP INDEX IF EXISTS idx_matches_win_type;
+
+-- Rankings por período: el rango de fechas se recorre dentro de la cofradía
+ALTER TABLE player_session_stats ADD COLUMN IF NOT EXISTS group_id INTEGER;
+UPDATE player_session_stats b SET group_id = s.group_id
+FROM sessions s
+WHERE s.session_id = b.session_id;
+ALTER TABLE player_session_stats ALTER COLUMN group_id SET NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_player_session_stats_group_date
+    ON player_session_stats (group_id, session_date) INCLUDE (player_id, matches_played, wins, runner_ups);
+DROP INDEX IF EXISTS idx_player_session_stats_date;
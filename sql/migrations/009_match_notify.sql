@@ -0,0 +1,15 @@
+-- Avisos en vivo: cada partida nueva emite un NOTIFY con "<group_id>:<game_id>".
+-- Postgres entrega los avisos al confirmar la transacción y junta los
+-- repetidos de una misma transacción, así que un lote (cola de escritura,
+-- importador) manda uno por cofradía y juego, no uno por partida.
+CREATE OR REPLACE FUNCTION notify_match_inserted() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('matches_inserted', NEW.group_id || ':' || COALESCE(NEW.game_id, 0));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_matches_notify ON matches;
+CREATE TRIGGER trg_matches_notify
+    AFTER INSERT ON matches
+    FOR EACH ROW EXECUTE FUNCTION notify_match_inserted();
@@ -0,0 +1,30 @@
+-- Resumen del Salón de la Fama (app/stats.py lo actualiza al guardar cada
+-- partida). init.sql lo crea en las bases nuevas; acá llega a las que ya
+-- existían, aunque hayan corrido las migraciones anteriores.
+CREATE TABLE IF NOT EXISTS player_stats (
+    player_id INTEGER PRIMARY KEY REFERENCES players(player_id),
+    matches_played INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    runner_ups INTEGER NOT NULL DEFAULT 0,
+    last_played DATE
+);
+
+-- Backfill con el historial (el mismo agregado que stats.SQL_REBUILD). Si la
+-- tabla ya venía de una versión anterior de 001, vacía, tiene solo las
+-- partidas guardadas desde entonces: se recalcula a partir de todas.
+INSERT INTO player_stats (player_id, matches_played, wins, runner_ups, last_played)
+SELECT
+    mp.player_id,
+    COUNT(*),
+    SUM(CASE WHEN mp.rank = 1 THEN 1 ELSE 0 END),
+    SUM(CASE WHEN mp.rank = 2 THEN 1 ELSE 0 END),
+    MAX(s.date)
+FROM match_participants mp
+JOIN matches m ON m.match_id = mp.match_id
+LEFT JOIN sessions s ON s.session_id = m.session_id
+GROUP BY mp.player_id
+ON CONFLICT (player_id) DO UPDATE SET
+    matches_played = EXCLUDED.matches_played,
+    wins = EXCLUDED.wins,
+    runner_ups = EXCLUDED.runner_ups,
+    last_played = EXCLUDED.last_played;
@@ -0,0 +1,5 @@
+-- El cara a cara sale de app/rivalries.py (conteo de pares en memoria). La
+-- vista era un self-join cuadrático sobre match_participants que nadie lee
+-- y que igual se refrescaba en cada vuelta.
+DROP MATERIALIZED VIEW IF EXISTS mv_head_to_head;
+DELETE FROM analytics_refresh WHERE view_name = 'mv_head_to_head';
@@ -0,0 +1,10 @@
+-- Transacción que insertó cada partida. Los lectores incrementales
+-- (rivalidades, rating, snapshots) ya no siguen "match_id mayor al último
+-- visto": una partida con match_id menor puede confirmarse después que una
+-- mayor (dos guardados a la vez, un lote de la cola) y quedaba salteada.
+-- En cambio guardan la foto (pg_current_snapshot) con la que leyeron y la
+-- próxima vez traen las filas que en esa foto no se veían.
+-- Las partidas existentes quedan con la transacción 1: anteriores a todo.
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS recorded_xid xid8 NOT NULL DEFAULT '1';
+ALTER TABLE matches ALTER COLUMN recorded_xid SET DEFAULT pg_current_xact_id();
+CREATE INDEX IF NOT EXISTS idx_matches_group_xid ON matches (group_id, recorded_xid);
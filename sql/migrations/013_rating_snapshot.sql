@@ -0,0 +1,7 @@
+-- El rating sigue las partidas por la foto en la que las leyó (ver 012), no
+-- por el match_id más alto procesado.
+ALTER TABLE rating_checkpoint ADD COLUMN IF NOT EXISTS snapshot TEXT NOT NULL DEFAULT '1:1:';
+ALTER TABLE rating_checkpoint DROP COLUMN IF EXISTS last_match_id;
+-- Con la foto vacía la próxima vuelta procesa todo el historial: se arranca de cero
+TRUNCATE player_ratings;
+CREATE INDEX IF NOT EXISTS idx_matches_xid ON matches (recorded_xid);
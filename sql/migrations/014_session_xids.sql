@@ -0,0 +1,5 @@
+-- Lo mismo que 012 para las juntadas: el snapshot Parquet las exporta por
+-- la foto de la última corrida, no por session_id.
+ALTER TABLE sessions ADD COLUMN IF NOT EXISTS recorded_xid xid8 NOT NULL DEFAULT '1';
+ALTER TABLE sessions ALTER COLUMN recorded_xid SET DEFAULT pg_current_xact_id();
+CREATE INDEX IF NOT EXISTS idx_sessions_xid ON sessions (recorded_xid);
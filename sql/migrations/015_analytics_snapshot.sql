@@ -0,0 +1,7 @@
+-- Las vistas de analítica guardan la foto de su último refresco (ver 012),
+-- no el match_id más alto: una partida con match_id menor que se confirmó
+-- después de un refresco no contaba como pendiente.
+ALTER TABLE analytics_refresh ADD COLUMN IF NOT EXISTS snapshot TEXT NOT NULL DEFAULT '1:1:';
+ALTER TABLE analytics_refresh DROP COLUMN IF EXISTS last_match_id;
+-- Con la foto vacía todas las partidas cuentan como pendientes: el primer
+-- ciclo del scheduler refresca las vistas
@@ -0,0 +1,5 @@
+#!/bin/sh
+# Permite que la réplica de lectura (servicio db_replica) se conecte para streaming.
+# Solo corre la primera vez que se crea la DB, igual que init.sql.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,19 @@
+"""Listas de los formularios (sin base de datos)."""
+from app import data
+
+
+def test_lookup_de_una_cofradia_nueva():
+    lookup = data._build_lookup([], [], [])
+    assert lookup.session_labels == ()
+    assert dict(lookup.session_ids) == {}
+
+
+def test_lookup_arma_las_etiquetas_de_las_juntadas():
+    lookup = data._build_lookup(
+        [{"session_id": 7, "date": "2026-10-18", "host": "Pepe"}],
+        [{"player_id": 1, "nickname": "Pepe"}],
+        [{"game_id": 3, "name": "Catan", "playable": True}],
+    )
+    assert lookup.session_labels == ("18/10/2026  -📍 Pepe",)
+    assert lookup.session_ids["18/10/2026  -📍 Pepe"] == 7
+    assert lookup.playable_games == ("Catan",)
@@ -0,0 +1,74 @@
+"""Análisis por juego contra una base real (se saltea si no hay Postgres).
+
+Todo corre dentro de una transacción que se descarta al final: no deja
+datos en la base.
+"""
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app import game_stats, history, matches
+from app.database import get_db_url
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine(get_db_url())
+    try:
+        connection = engine.connect()
+    except exc.DBAPIError as e:
+        pytest.skip(f"Sin base de datos: {e}")
+    transaction = connection.begin()
+    try:
+        yield connection
+    finally:
+        transaction.rollback()
+        connection.close()
+        engine.dispose()
+
+
+def _game_report(conn, game_id):
+    df = pd.read_sql_query(text(game_stats.SQL_GAME_REPORT), conn, params={"games": [game_id]})
+    return game_stats._build_reports(df, [game_id])[("game_stats", game_id)]
+
+
+def _new_game(conn):
+    """Juego, juntada y dos jugadores nuevos (en la primera cofradía) para la prueba."""
+    group_id = conn.execute(text("SELECT group_id FROM groups ORDER BY group_id LIMIT 1")).scalar_one()
+    game_id = conn.execute(text(
+        "INSERT INTO games (name, type, group_id) VALUES ('Juego de prueba', 'Casual', :g) RETURNING game_id"
+    ), {"g": group_id}).scalar_one()
+    session_id = conn.execute(text(
+        "INSERT INTO sessions (date, group_id) VALUES ('1900-01-01', :g) RETURNING session_id"
+    ), {"g": group_id}).scalar_one()
+    players = [
+        conn.execute(text(
+            "INSERT INTO players (name, nickname, group_id) VALUES (:n, :n, :g) RETURNING player_id"
+        ), {"n": name, "g": group_id}).scalar_one()
+        for name in ("Prueba A", "Prueba B")
+    ]
+    return game_id, session_id, players
+
+
+def test_clutch_y_paliza_cuentan_las_partidas_guardadas(conn):
+    game_id, session_id, players = _new_game(conn)
+    # Los mismos valores que guarda el formulario de partidas
+    for win_type in (history.WIN_CLUTCH, history.WIN_PALIZA, history.WIN_NORMAL, history.WIN_NORMAL):
+        matches.record_match(conn, session_id, game_id, players[0], win_type, 30, players)
+
+    summary = _game_report(conn, game_id)["summary"]
+    assert summary["matches"] == 4
+    assert summary["clutch_pct"] == 25.0
+    assert summary["paliza_pct"] == 25.0
+
+
+def test_partida_sin_ganador_no_rompe_el_reporte(conn):
+    game_id, session_id, players = _new_game(conn)
+    matches.record_match(conn, session_id, game_id, players[0], history.WIN_NORMAL, 30, players)
+    # winner_id admite NULL (partidas viejas o cargadas a mano)
+    matches.record_match(conn, session_id, game_id, None, history.WIN_NORMAL, 30, players)
+
+    report = _game_report(conn, game_id)
+    assert report["summary"]["matches"] == 2
+    assert report["winners"]["winner_id"].tolist() == [players[0]]
+    assert report["winners"]["share_pct"].tolist() == [100.0]